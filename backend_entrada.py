@@ -0,0 +1,53 @@
+# backend_entrada.py
+
+import abc
+import sys
+
+
+class InputBackend(abc.ABC):
+    """
+    Interfaz común de los backends de entrada del ratón.
+
+    Cada backend entrega deltas crudos y el estado del botón izquierdo a los
+    mismos callbacks, sin importar el sistema operativo:
+
+    :param on_mouse_move: Función a llamar en movimiento. Recibe (dx, dy).
+    :param on_left_down: Función a llamar cuando se presiona el botón izquierdo.
+    :param on_left_up: Función a llamar cuando se suelta el botón izquierdo.
+    """
+    def __init__(self, on_mouse_move=None, on_left_down=None, on_left_up=None):
+        self.on_mouse_move = on_mouse_move
+        self.on_left_down = on_left_down
+        self.on_left_up = on_left_up
+
+    @abc.abstractmethod
+    def setup(self):
+        """Prepara el dispositivo / ventana para empezar a recibir eventos."""
+
+    @abc.abstractmethod
+    def poll(self):
+        """
+        Procesa sin bloquear todos los eventos pendientes e invoca los
+        callbacks. Devuelve la cantidad de mensajes/eventos procesados.
+        """
+
+    @abc.abstractmethod
+    def esperar(self, timeout=None):
+        """
+        Bloquea hasta que haya eventos pendientes o pasen `timeout` segundos
+        (None = sin límite). Devuelve True si hay algo que procesar.
+        """
+
+    def close(self):
+        """Libera los recursos del backend."""
+
+
+def crear_listener(on_mouse_move=None, on_left_down=None, on_left_up=None, **kwargs):
+    """Crea el backend de entrada adecuado para el sistema operativo actual."""
+    if sys.platform == "win32":
+        from mouse import RawMouseListener
+        return RawMouseListener(on_mouse_move, on_left_down, on_left_up, **kwargs)
+    if sys.platform.startswith("linux"):
+        from mouse_evdev import EvdevMouseListener
+        return EvdevMouseListener(on_mouse_move, on_left_down, on_left_up, **kwargs)
+    raise OSError(f"No hay backend de entrada para la plataforma '{sys.platform}'")
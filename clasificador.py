@@ -0,0 +1,78 @@
+# clasificador.py
+
+import numpy as np
+
+PUNTOS_DESCRIPTOR = 32   # puntos del descriptor remuestreado
+MIN_BALAS = 5            # prefijo mínimo de patrón que se indexa
+
+
+def descriptor(posiciones, k=PUNTOS_DESCRIPTOR):
+    """
+    Descriptor de forma: k puntos equiespaciados por longitud de arco,
+    relativos al primer punto y divididos por su radio RMS (invariante a la
+    sensibilidad). Devuelve un vector float32 de 2k (o None si no hay trazo).
+    """
+    pos = np.asarray(posiciones, dtype=np.float32).reshape(-1, 2)
+    if len(pos) < 2:
+        return None
+    seg = np.hypot(*np.diff(pos, axis=0).T)
+    arco = np.concatenate(([0.0], np.cumsum(seg)))
+    largo = float(arco[-1])
+    if largo == 0:
+        return None
+    s = np.linspace(0.0, largo, k)
+    out = np.empty((k, 2), dtype=np.float32)
+    out[:, 0] = np.interp(s, arco, pos[:, 0] - pos[0, 0])
+    out[:, 1] = np.interp(s, arco, pos[:, 1] - pos[0, 1])
+    escala = float(np.sqrt((out ** 2).sum(axis=1).mean()))
+    if escala == 0:
+        return None
+    out /= escala
+    return out.ravel()
+
+
+class ClasificadorArmas:
+    """
+    Identifica el arma a partir de la forma de un trazo terminado.
+
+    Al crearse indexa, para cada arma, el descriptor de todos sus prefijos
+    (las primeras n balas) en una matriz (armas, balas, 2k). Clasificar elige
+    por arma el prefijo que corresponde a la duración del spray y calcula
+    todas las distancias en una sola operación vectorizada.
+    """
+    def __init__(self, patrones):
+        """:param patrones: dict nombre -> PatronArma (ver patrones.py)."""
+        self.nombres = [n for n, p in sorted(patrones.items()) if len(p.puntos) >= MIN_BALAS]
+        n_max = max((len(patrones[n].puntos) for n in self.nombres), default=0)
+        self.cadencias = np.array([patrones[n].cadencia_ms for n in self.nombres], dtype=np.float32)
+        self.balas = np.array([len(patrones[n].puntos) for n in self.nombres], dtype=np.int32)
+        self.indice = np.zeros((len(self.nombres), n_max + 1, 2 * PUNTOS_DESCRIPTOR), dtype=np.float32)
+        for i, nombre in enumerate(self.nombres):
+            puntos = patrones[nombre].puntos
+            for n in range(2, len(puntos) + 1):
+                d = descriptor(puntos[:n])
+                if d is not None:
+                    self.indice[i, n] = d
+            # Prefijos más cortos que 2 balas usan el de 2
+            self.indice[i, :2] = self.indice[i, 2]
+        self._filas = np.arange(len(self.nombres))
+
+    def clasificar(self, posiciones, duracion_ms):
+        """
+        Devuelve (arma, confianza, distancia). La confianza va de 0 a 1 y
+        mide cuánto mejor es el primer candidato que el segundo.
+        """
+        q = descriptor(posiciones)
+        if q is None or not self.nombres:
+            return None, 0.0, float("inf")
+        # Balas disparadas según la cadencia de cada arma
+        n = np.clip(np.rint(duracion_ms / self.cadencias).astype(np.int32) + 1, MIN_BALAS, self.balas)
+        candidatos = self.indice[self._filas, n]
+        dist = np.sqrt(((candidatos - q) ** 2).sum(axis=1))
+        orden = np.argsort(dist)
+        mejor = int(orden[0])
+        if len(orden) > 1 and dist[orden[1]] > 0:
+            confianza = float(1.0 - dist[mejor] / dist[orden[1]])
+        else:
+            confianza = 1.0
+        return self.nombres[mejor], confianza, float(dist[mejor])
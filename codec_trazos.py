@@ -0,0 +1,248 @@
+# codec_trazos.py
+
+import struct
+import numpy as np
+
+# Formato de archivo:
+#   MAGIC
+#   [u32 largo][registro] [u32 largo][registro] ...   (solo se agregan registros)
+#
+# Registro (little-endian):
+#   <d timestamp> <f sensibilidad> <H largo_nombre> <I muestras> <I chunks> nombre_utf8
+#   índice: chunks x INDICE_DTYPE
+#   payload: varints de cada chunk concatenados
+#
+# Cada chunk es decodificable por sí solo: su entrada del índice guarda la
+# posición y el tiempo acumulados antes del chunk. Dentro del chunk van
+# 3 * n varints: zigzag(dx)..., zigzag(dy)..., zigzag(delta de delta de t en µs)...
+
+MAGIC = b"CS2TRZ1\n"
+MUESTRAS_POR_CHUNK = 4096
+
+_CABECERA = struct.Struct("<dfHII")
+_LARGO = struct.Struct("<I")
+
+INDICE_DTYPE = np.dtype([
+    ("n", "<u4"), ("bytes", "<u4"),
+    ("t_base", "<i8"), ("dt_base", "<i8"),
+    ("x_base", "<i4"), ("y_base", "<i4"),
+])
+
+
+# --- Zigzag + varint vectorizados ---
+
+def zigzag(valores):
+    v = np.asarray(valores, dtype=np.int64)
+    return ((v << 1) ^ (v >> 63)).view(np.uint64)
+
+
+def unzigzag(valores):
+    v = np.asarray(valores, dtype=np.uint64)
+    return ((v >> np.uint64(1)).view(np.int64)) ^ -(v & np.uint64(1)).view(np.int64)
+
+
+def codificar_varints(valores):
+    """Codifica un array uint64 como varints LEB128 (7 bits por byte)."""
+    v = np.asarray(valores, dtype=np.uint64)
+    if len(v) == 0:
+        return b""
+    if v.max() < 0x80:
+        return v.astype(np.uint8).tobytes()  # caso común: todo entra en un byte
+    # Bytes necesarios por valor: 1 + floor(bits / 7)
+    largos = np.ones(len(v), dtype=np.int64)
+    resto = v >> np.uint64(7)
+    while resto.any():
+        largos += resto > 0
+        resto >>= np.uint64(7)
+    inicios = np.cumsum(largos) - largos
+    idx = np.repeat(np.arange(len(v)), largos)
+    k = np.arange(int(largos.sum())) - inicios[idx]
+    out = (v[idx] >> (np.uint64(7) * k.astype(np.uint64))) & np.uint64(0x7F)
+    out |= (k < largos[idx] - 1).astype(np.uint64) << np.uint64(7)
+    return out.astype(np.uint8).tobytes()
+
+
+def decodificar_varints(datos):
+    """Decodifica varints LEB128 a un array uint64."""
+    b = np.frombuffer(datos, dtype=np.uint8)
+    if len(b) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    fin = b < 0x80
+    if fin.all():
+        return b.astype(np.uint64)  # caso común: todo entra en un byte
+    inicios = np.empty(int(fin.sum()), dtype=np.int64)
+    inicios[0] = 0
+    inicios[1:] = np.flatnonzero(fin[:-1]) + 1
+    # Un paso por posición de byte (máx. 10), solo sobre los valores que siguen
+    valores = (b[inicios] & 0x7F).astype(np.uint64)
+    sigue = np.flatnonzero(b[inicios] >= 0x80)
+    k = 1
+    while len(sigue):
+        byte = b[inicios[sigue] + k]
+        valores[sigue] |= (byte & 0x7F).astype(np.uint64) << np.uint64(7 * k)
+        sigue = sigue[byte >= 0x80]
+        k += 1
+    return valores
+
+
+# --- Registros ---
+
+def codificar_trazo(deltas, tiempos_ms, muestras_por_chunk=MUESTRAS_POR_CHUNK):
+    """
+    Codifica deltas enteros (N, 2) y sus tiempos en ms. Devuelve
+    (índice, payload). Los tiempos se cuantizan a microsegundos.
+    """
+    deltas = np.asarray(deltas, dtype=np.int64).reshape(-1, 2)
+    t = np.round(np.asarray(tiempos_ms, dtype=np.float64) * 1000).astype(np.int64)
+    n = len(deltas)
+
+    dt = np.diff(t, prepend=0)
+    dod = np.diff(dt, prepend=0)
+    pos = np.cumsum(deltas, axis=0)
+
+    inicios = np.arange(0, n, muestras_por_chunk)
+    indice = np.zeros(len(inicios), dtype=INDICE_DTYPE)
+    trozos = []
+    for c, s in enumerate(inicios):
+        e = min(s + muestras_por_chunk, n)
+        if s > 0:
+            indice[c]["t_base"] = t[s - 1]
+            indice[c]["dt_base"] = dt[s - 1]
+            indice[c]["x_base"], indice[c]["y_base"] = pos[s - 1]
+        # El primer dod del chunk se recalcula contra la base para que sea independiente
+        dod_chunk = dod[s:e].copy()
+        dod_chunk[0] = dt[s] - indice[c]["dt_base"]
+        valores = np.concatenate((zigzag(deltas[s:e, 0]), zigzag(deltas[s:e, 1]), zigzag(dod_chunk)))
+        trozo = codificar_varints(valores)
+        indice[c]["n"] = e - s
+        indice[c]["bytes"] = len(trozo)
+        trozos.append(trozo)
+    return indice, b"".join(trozos)
+
+
+def decodificar_chunk(entrada, datos, posiciones=False):
+    """
+    Decodifica un chunk a (deltas (n, 2) int32, tiempos_ms float64). Con
+    posiciones=True devuelve también la posición acumulada de cada muestra.
+    """
+    n = int(entrada["n"])
+    valores = unzigzag(decodificar_varints(datos))
+    deltas = np.empty((n, 2), dtype=np.int32)
+    deltas[:, 0] = valores[:n]
+    deltas[:, 1] = valores[n:2 * n]
+    dt = int(entrada["dt_base"]) + np.cumsum(valores[2 * n:3 * n])
+    tiempos_ms = (int(entrada["t_base"]) + np.cumsum(dt)) / 1000.0
+    if not posiciones:
+        return deltas, tiempos_ms
+    pos = np.cumsum(deltas, axis=0, dtype=np.int64)
+    pos += (int(entrada["x_base"]), int(entrada["y_base"]))
+    return deltas, tiempos_ms, pos
+
+
+class RegistroTrazo:
+    """Registro codificado de un trazo, con acceso aleatorio por chunk."""
+
+    def __init__(self, weapon, timestamp, sensibilidad, indice, payload):
+        self.weapon = weapon
+        self.timestamp = timestamp
+        self.sensibilidad = sensibilidad
+        self.indice = indice
+        self.payload = payload
+        self.offsets = np.concatenate(([0], np.cumsum(indice["bytes"], dtype=np.int64)))
+        self.muestras = np.concatenate(([0], np.cumsum(indice["n"], dtype=np.int64)))
+
+    def __len__(self):
+        return int(self.muestras[-1])
+
+    def decodificar(self):
+        """Decodifica el trazo completo a (deltas, tiempos_ms)."""
+        return self.decodificar_tramo(0, len(self))
+
+    def decodificar_tramo(self, inicio, fin):
+        """Decodifica solo las muestras [inicio, fin), leyendo los chunks necesarios."""
+        inicio = max(int(inicio), 0)
+        fin = min(int(fin), len(self))
+        if inicio >= fin:
+            return np.zeros((0, 2), dtype=np.int32), np.zeros(0, dtype=np.float64)
+        c0 = max(int(np.searchsorted(self.muestras, inicio, side="right")) - 1, 0)
+        c1 = int(np.searchsorted(self.muestras, fin, side="left"))
+        partes_d, partes_t = [], []
+        for c in range(c0, c1):
+            datos = self.payload[self.offsets[c]:self.offsets[c + 1]]
+            d, t = decodificar_chunk(self.indice[c], datos)
+            partes_d.append(d)
+            partes_t.append(t)
+        if not partes_d:
+            return np.zeros((0, 2), dtype=np.int32), np.zeros(0, dtype=np.float64)
+        base = int(self.muestras[c0])
+        deltas = np.concatenate(partes_d)[inicio - base:fin - base]
+        tiempos = np.concatenate(partes_t)[inicio - base:fin - base]
+        return deltas, tiempos
+
+    def a_bytes(self):
+        nombre = self.weapon.encode("utf-8")
+        cabecera = _CABECERA.pack(self.timestamp, self.sensibilidad, len(nombre), len(self), len(self.indice))
+        return cabecera + nombre + self.indice.tobytes() + self.payload
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        timestamp, sensibilidad, largo_nombre, _, n_chunks = _CABECERA.unpack_from(datos, 0)
+        p = _CABECERA.size
+        weapon = bytes(datos[p:p + largo_nombre]).decode("utf-8")
+        p += largo_nombre
+        fin_indice = p + n_chunks * INDICE_DTYPE.itemsize
+        indice = np.frombuffer(datos[p:fin_indice], dtype=INDICE_DTYPE)
+        return cls(weapon, timestamp, sensibilidad, indice, datos[fin_indice:])
+
+    @classmethod
+    def codificar(cls, weapon, timestamp, sensibilidad, deltas, tiempos_ms):
+        indice, payload = codificar_trazo(deltas, tiempos_ms)
+        return cls(weapon, timestamp, sensibilidad, indice, payload)
+
+
+# --- Archivos ---
+
+def agregar_registros(path, registros):
+    """Agrega registros al final del archivo (lo crea con MAGIC si no existe)."""
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            f.write(MAGIC)
+        for registro in registros:
+            datos = registro.a_bytes()
+            f.write(_LARGO.pack(len(datos)))
+            f.write(datos)
+
+
+def leer_registros(path):
+    """Lee todos los registros de un archivo. Los payloads son vistas sin copia."""
+    with open(path, "rb") as f:
+        contenido = memoryview(f.read())
+    if bytes(contenido[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"'{path}' no es un archivo de trazos")
+    registros = []
+    p = len(MAGIC)
+    while p + _LARGO.size <= len(contenido):
+        (largo,) = _LARGO.unpack_from(contenido, p)
+        p += _LARGO.size
+        if p + largo > len(contenido):
+            break  # registro truncado (escritura interrumpida)
+        registros.append(RegistroTrazo.desde_bytes(contenido[p:p + largo]))
+        p += largo
+    return registros
+
+
+def codificar_puntos(weapon, puntos, cadencia_ms):
+    """
+    Codifica una secuencia de puntos de recoil (N, 2) como registro: el
+    primer punto es el origen y cada bala sale cada cadencia_ms.
+    """
+    puntos = np.round(np.asarray(puntos, dtype=np.float64)).astype(np.int64).reshape(-1, 2)
+    deltas = np.diff(puntos, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    tiempos = np.arange(len(puntos)) * float(cadencia_ms)
+    return RegistroTrazo.codificar(weapon, 0.0, 1.0, deltas, tiempos)
+
+
+def puntos_de_registro(registro):
+    """Inverso de codificar_puntos(): devuelve los puntos (N, 2) int64."""
+    deltas, _ = registro.decodificar()
+    return np.cumsum(deltas, axis=0, dtype=np.int64)
@@ -1,7 +1,12 @@
 import os
-import winreg
+import sys
 
 def crear_archivo_gsi( ):
+    if sys.platform != "win32":
+        print("crear_archivo_gsi: solo disponible en Windows, se omite.")
+        return
+    import winreg
+
     ruta_steam = None
     try:
         clave = r"SOFTWARE\Wow6432Node\Valve\cs2"
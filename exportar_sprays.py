@@ -0,0 +1,223 @@
+# exportar_sprays.py
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from codec_trazos import leer_registros
+from patrones import cargar_patrones_arma, RECOIL_PATTERNS_DIR
+from puntuacion import errores_por_bala
+from sprays import Spray, SPRAYS_DIR
+from versiones_patrones import VersionesPatrones
+
+OUTPUT_DIR = "exportes"
+SPRAYS_POR_ROW_GROUP = 1024
+MANIFIESTO = "_exportado.json"
+
+ESQUEMA = pa.schema([
+    ("spray_id", pa.int64()),
+    ("timestamp", pa.timestamp("ms")),
+    ("weapon", pa.dictionary(pa.int16(), pa.string())),
+    ("sensibilidad", pa.float32()),
+    ("duracion_ms", pa.float32()),
+    ("eventos", pa.int32()),
+    ("dx", pa.list_(pa.int32())),
+    ("dy", pa.list_(pa.int32())),
+    ("t_ms", pa.list_(pa.float32())),
+    ("error_balas", pa.list_(pa.float32())),
+    ("error_medio", pa.float32()),
+])
+
+
+def iterar_sprays(directorio=SPRAYS_DIR, desde_timestamp=None):
+    """Recorre los sprays de los .trz de a un archivo (sin cargar toda la historia)."""
+    if not os.path.exists(directorio):
+        return
+    for filename in sorted(os.listdir(directorio)):
+        if not filename.endswith(".trz"):
+            continue
+        for registro in leer_registros(os.path.join(directorio, filename)):
+            if desde_timestamp is not None and registro.timestamp <= desde_timestamp:
+                continue
+            yield Spray.desde_registro(registro)
+
+
+def _lista(offsets, valores, tipo):
+    """ListArray a partir de offsets/valores NumPy (sin copiar los valores)."""
+    return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), pa.array(valores, type=tipo))
+
+
+class LoteSprays:
+    """
+    Acumula sprays en buffers NumPy y los convierte en un RecordBatch. Las
+    columnas de listas se arman con offsets + valores concatenados, de modo
+    que Arrow toma los buffers de NumPy sin copia.
+    """
+    def __init__(self, patrones, versiones=None):
+        """
+        :param patrones: {arma: PatronArma} del set actual.
+        :param versiones: VersionesPatrones opcional; si se da, cada spray se
+            puntúa contra el patrón vigente en su fecha.
+        """
+        self.patrones = patrones
+        self.versiones = versiones
+        self.limpiar()
+
+    def limpiar(self):
+        self.filas = []
+        self.deltas = []
+        self.tiempos = []
+        self.errores = []
+
+    def __len__(self):
+        return len(self.filas)
+
+    def agregar(self, spray):
+        if self.versiones is not None:
+            version = self.versiones.version_vigente(spray.timestamp)
+            patron = self.versiones.patron(version, spray.weapon) if version else None
+        else:
+            patron = self.patrones.get(spray.weapon)
+        if patron is not None:
+            errores = errores_por_bala(spray.posiciones(), spray.tiempos_ms, patron)
+        else:
+            errores = np.zeros(0, dtype=np.float32)
+        duracion = float(spray.tiempos_ms[-1]) if len(spray.tiempos_ms) else 0.0
+        self.filas.append((int(spray.timestamp * 1000), spray.weapon, spray.sensibilidad,
+                           duracion, len(spray.deltas), float(errores.mean()) if len(errores) else np.nan))
+        self.deltas.append(spray.deltas)
+        self.tiempos.append(spray.tiempos_ms)
+        self.errores.append(errores)
+
+    def a_record_batch(self):
+        ids, weapons, sens, duraciones, eventos, error_medio = zip(*self.filas)
+        n_eventos = np.fromiter((len(d) for d in self.deltas), dtype=np.int32, count=len(self.deltas))
+        n_balas = np.fromiter((len(e) for e in self.errores), dtype=np.int32, count=len(self.errores))
+        off_eventos = np.concatenate(([0], np.cumsum(n_eventos, dtype=np.int32)))
+        off_balas = np.concatenate(([0], np.cumsum(n_balas, dtype=np.int32)))
+        deltas = np.concatenate(self.deltas).astype(np.int32, copy=False)
+        tiempos = np.concatenate(self.tiempos).astype(np.float32, copy=False)
+        errores = np.concatenate(self.errores).astype(np.float32, copy=False)
+        ids = np.asarray(ids, dtype=np.int64)
+
+        columnas = [
+            pa.array(ids),
+            pa.array(ids.view("datetime64[ms]")),
+            pa.array(weapons, type=pa.string()).dictionary_encode().cast(ESQUEMA.field("weapon").type),
+            pa.array(np.asarray(sens, dtype=np.float32)),
+            pa.array(np.asarray(duraciones, dtype=np.float32)),
+            pa.array(np.asarray(eventos, dtype=np.int32)),
+            _lista(off_eventos, np.ascontiguousarray(deltas[:, 0]), pa.int32()),
+            _lista(off_eventos, np.ascontiguousarray(deltas[:, 1]), pa.int32()),
+            _lista(off_eventos, tiempos, pa.float32()),
+            _lista(off_balas, errores, pa.float32()),
+            pa.array(np.asarray(error_medio, dtype=np.float32)),
+        ]
+        return pa.RecordBatch.from_arrays(columnas, schema=ESQUEMA)
+
+
+def leer_manifiesto(salida):
+    path = os.path.join(salida, MANIFIESTO)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def escribir_manifiesto(salida, manifiesto):
+    path = os.path.join(salida, MANIFIESTO)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifiesto, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def exportar(sprays, path, patrones, formato="parquet", sprays_por_grupo=SPRAYS_POR_ROW_GROUP, versiones=None):
+    """
+    Escribe los sprays en un archivo Parquet (un row group cada
+    sprays_por_grupo) o en un stream IPC de Arrow. La memoria queda acotada
+    al tamaño de un lote. Devuelve (sprays exportados, último timestamp).
+    """
+    lote = LoteSprays(patrones, versiones)
+    total = 0
+    ultimo = None
+    writer = None
+    sink = None
+    try:
+        for spray in sprays:
+            lote.agregar(spray)
+            ultimo = spray.timestamp if ultimo is None else max(ultimo, spray.timestamp)
+            if len(lote) < sprays_por_grupo:
+                continue
+            if writer is None:
+                writer, sink = _abrir_writer(path, formato)
+            _escribir_lote(writer, lote, formato)
+            total += len(lote)
+            lote.limpiar()
+        if len(lote):
+            if writer is None:
+                writer, sink = _abrir_writer(path, formato)
+            _escribir_lote(writer, lote, formato)
+            total += len(lote)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    return total, ultimo
+
+
+def _abrir_writer(path, formato):
+    if formato == "parquet":
+        return pq.ParquetWriter(path, ESQUEMA, compression="zstd"), None
+    sink = pa.OSFile(path, "wb")
+    return pa.ipc.new_stream(sink, ESQUEMA), sink
+
+
+def _escribir_lote(writer, lote, formato):
+    batch = lote.a_record_batch()
+    if formato == "parquet":
+        writer.write_batch(batch, row_group_size=len(lote))
+    else:
+        writer.write_batch(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta sprays y errores por bala a Parquet / Arrow")
+    parser.add_argument("--sprays", default=SPRAYS_DIR)
+    parser.add_argument("--patrones", default=RECOIL_PATTERNS_DIR)
+    parser.add_argument("--salida", default=OUTPUT_DIR)
+    parser.add_argument("--formato", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--append", action="store_true",
+                        help="exportar solo los sprays nuevos a un archivo adicional del dataset")
+    parser.add_argument("--row-group", type=int, default=SPRAYS_POR_ROW_GROUP)
+    parser.add_argument("--por-version", action="store_true",
+                        help="puntuar cada spray con el patrón de la versión del juego vigente en su fecha")
+    args = parser.parse_args()
+
+    os.makedirs(args.salida, exist_ok=True)
+    manifiesto = leer_manifiesto(args.salida) if args.append else {}
+    desde = manifiesto.get("ultimo_timestamp")
+
+    extension = "parquet" if args.formato == "parquet" else "arrow"
+    path = os.path.join(args.salida, f"sprays-{time.strftime('%Y%m%d-%H%M%S')}.{extension}")
+    patrones = cargar_patrones_arma(args.patrones)
+    versiones = VersionesPatrones(os.path.join(args.patrones, "versiones")) if args.por_version else None
+
+    inicio = time.perf_counter()
+    total, ultimo = exportar(iterar_sprays(args.sprays, desde), path, patrones, args.formato,
+                            args.row_group, versiones)
+    if total == 0:
+        print("No hay sprays nuevos para exportar.")
+        return
+    manifiesto["ultimo_timestamp"] = ultimo
+    manifiesto.setdefault("archivos", []).append(os.path.basename(path))
+    escribir_manifiesto(args.salida, manifiesto)
+    print(f"[OK] {total} sprays exportados a {path} en {time.perf_counter() - inicio:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
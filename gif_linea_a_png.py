@@ -1,12 +1,17 @@
 import os
 import cv2
 import numpy as np
+from versiones_patrones import registrar_version
 from PIL import Image, ImageSequence
 
 INPUT_DIR = "./recoils"
 OUTPUT_DIR = "./recoil_json"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Versión del juego de los GIFs; si se indica, al terminar se registra el set
+# resultante en recoil_json/versiones/ (ver versiones_patrones.py)
+GAME_VERSION = None
+
 # parámetros
 BACKGROUND_BGR = (32, 20, 22)
 TOLERANCE = 40
@@ -145,3 +150,7 @@ for file in sorted(os.listdir(INPUT_DIR)):
 
     # activa debug=True para imprimir coordenadas de verificación
     process_gif(in_path, out_path, debug=True)
+
+if GAME_VERSION:
+    manifiesto, nuevos = registrar_version(GAME_VERSION)
+    print(f"[OK] Set registrado como versión {GAME_VERSION} ({nuevos} armas con cambios)")
@@ -3,7 +3,10 @@ import math
 import os
 import cv2
 import numpy as np
+from versiones_patrones import registrar_version
 from PIL import Image
+from codec_trazos import codificar_puntos, agregar_registros
+from patrones import CADENCIA_MS, CADENCIA_POR_DEFECTO_MS
 
 # Ajustes de tamaño de contornos
 MIN_W, MAX_W = 6, 12
@@ -13,6 +16,10 @@ IGNORE_BORDER = 100  # opcional, ajustar si quieres ignorar bordes
 BACKGROUND_BGR = (32, 20, 22)
 BG_TOLERANCE = 3
 
+# Versión del juego de los GIFs; si se indica, al terminar se registra el set
+# resultante en recoil_json/versiones/ (ver versiones_patrones.py)
+GAME_VERSION = None
+
 def dist(p1, p2):
     return ((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)**0.5
 
@@ -111,7 +118,14 @@ def extract_points_with_roi(gif_path):
     with open(json_path, "w") as f:
         json.dump(normalized, f, indent=4)
 
-    print(f"[OK] Recoil normalizado guardado en {json_path}")
+    # Copia compacta (deltas varint) que usa el trainer al cargar
+    trz_path = os.path.join(output_dir, f"{weapon_name}.trz")
+    if os.path.exists(trz_path):
+        os.remove(trz_path)
+    cadencia = CADENCIA_MS.get(weapon_name, CADENCIA_POR_DEFECTO_MS)
+    agregar_registros(trz_path, [codificar_puntos(weapon_name, normalized, cadencia)])
+
+    print(f"[OK] Recoil normalizado guardado en {json_path} y {trz_path}")
     return points, normalized
 
 
@@ -133,3 +147,7 @@ for archivo in os.listdir("recoils"):
     show_points(points, (600,600))
     
 
+
+if GAME_VERSION:
+    manifiesto, nuevos = registrar_version(GAME_VERSION)
+    print(f"[OK] Set registrado como versión {GAME_VERSION} ({nuevos} armas con cambios)")
@@ -4,17 +4,20 @@ import sys
 import time
 import os
 import numpy as np
-import cv2  # <--- Nuevo import para OpenCV
 from skimage.metrics import structural_similarity as ssim # <--- Para la comparación
-from ctypes import wintypes
-import ctypes
 from PyQt5 import QtWidgets
 import threading
 from overlay import OverlayWindow 
-from mouse import RawMouseListener
-from servidor_gsi_arma_uso import GsiHandler
+from backend_entrada import crear_listener
+from servidor_gsi_arma_uso import GsiHandler, MetricsHandler
+from metricas import REGISTRO
 from mask_window import MaskWindow
 from crear_archivo_gsi import crear_archivo_gsi
+from recarga_patrones import ConjuntoPatrones, VigilantePatrones
+from segmentador import SegmentadorDisparos
+from sprays import Spray, guardar_spray
+from simplificador import SimplificadorTemporal, error_sincronico
+from servidor_coach import ClienteCoach, COACH_PORT
 import socketserver
 crear_archivo_gsi()
 
@@ -24,51 +27,80 @@ WIDTH, HEIGHT = 300, 600
 CENTER = (WIDTH // 2, HEIGHT // 2)
 RECOIL_PATTERNS_DIR = "recoil_json"
 COMPARISON_THRESHOLD_MS = 1000  # N ms: tiempo mínimo para activar la comparación
+GSI_PORT = 54322
+METRICS_PORT = 54323
+ESCALAS_ALINEACION = (1.0,)     # p.ej. (0.9, 1.0, 1.1) para buscar también la escala
+GSI_TIMEOUT_S = 30              # sin payloads GSI en este tiempo => arma no confiable
+CONFIANZA_MIN_CLASIFICADOR = 0.25
+MODO_BAJO_IMPACTO = False       # Limita el overlay a 30 FPS en equipos modestos
+GUARDAR_SPRAYS = True           # Guarda cada spray analizado en sprays/ (para render_sprays.py)
+GUARDAR_TRAZO_COMPLETO = False  # Guardar todos los eventos en vez del trazo simplificado
+COACH_HOST = None               # IP del servidor del coach (servidor_coach.py) para enviarle cada spray
+COACH_JUGADOR = os.environ.get("USERNAME") or os.environ.get("USER") or "jugador"
+RECARGA_EN_CALIENTE = True      # Recarga los patrones al cambiar recoil_json/ (sin reiniciar)
+ESPERA_MAX_S = 0.01             # Tope de la espera del bucle (eventos de Qt que no pasan por el backend)
 
 # --- Variables de Estado Global ---
 tracking = False
-request_reset = False
 current_weapon = "weapon_ak47"
 position = list(CENTER)
 canvas = np.zeros((HEIGHT, WIDTH, 4), dtype=np.uint8)
 
 # --- Nuevas variables para la comparación ---
-recoil_patterns = {}         # Diccionario para guardar las imágenes de patrones
+patrones = ConjuntoPatrones(canvas.shape, RECOIL_PATTERNS_DIR)  # vigente (se reemplaza al recargar)
+patrones_spray = None        # ConjuntoPatrones con el que empezó el spray en curso
+puntuador = None             # Puntuador del segmento en curso
+segmento = None              # Segmento en curso (el que puntúa `puntuador`)
+segmento_origen = (0, 0)     # Posición del overlay en la primera bala del segmento
+segmentador = None           # SegmentadorDisparos (taps / ráfagas / sprays)
+segmentador_patron = None    # PatronArma para el que está configurado el segmentador
 click_start_time = 0         # Para medir la duración del clic
+trazo_tiempos = []           # ms desde el inicio del clic de cada delta
+trazo_deltas = []            # deltas (dx, dy) orientados como en el canvas
+trazo_posicion = [0.0, 0.0]  # posición acumulada (px) desde el inicio del clic
+simplificador_spray = SimplificadorTemporal()  # vértices del trazo que se guardan
+coach = None                 # ClienteCoach si COACH_HOST está configurado
 
 # --- Instancias de la UI ---
 app = QtWidgets.QApplication(sys.argv)
-overlay = OverlayWindow(canvas, position, sensitivity=0.35, invert_y=False)
+overlay = OverlayWindow(canvas, position, sensitivity=0.35, invert_y=False, bajo_impacto=MODO_BAJO_IMPACTO)
+
+# --- Métricas ---
+m_mouse_events = REGISTRO.contador("input_mouse_events_total", "Eventos raw de movimiento del ratón")
+m_clicks = REGISTRO.contador("input_left_clicks_total", "Pulsaciones del botón izquierdo")
+m_left_up = REGISTRO.histograma("handle_left_up_seconds", "Duración de handle_left_up")
+m_sprays = REGISTRO.contador("sprays_analyzed_total", "Sprays comparados contra un patrón")
+m_mensajes = REGISTRO.contador("loop_messages_dispatched_total", "Mensajes/eventos de entrada despachados")
+m_cola = REGISTRO.medidor("loop_message_backlog", "Mensajes pendientes drenados en la última iteración")
+m_compresion = REGISTRO.medidor("spray_compression_ratio", "Eventos por vértice del último spray simplificado")
+m_error_simplificacion = REGISTRO.medidor("spray_simplification_max_error_px",
+                                          "Error máximo del último spray simplificado")
  
 
 # --- Nuevas Funciones para Carga y Comparación ---
 
 def load_recoil_patterns():
     """
-    Carga todas las imágenes .png de la carpeta de patrones al iniciar.
+    Construye el conjunto de patrones (imágenes, guías, puntuadores y
+    clasificador) a partir de la carpeta de patrones al iniciar.
     """
+    global patrones
     if not os.path.exists(RECOIL_PATTERNS_DIR):
         print(f"⚠️  Directorio de patrones no encontrado: '{RECOIL_PATTERNS_DIR}'")
         return
     
     print("🔎 Cargando patrones de recoil...")
-    for filename in os.listdir(RECOIL_PATTERNS_DIR):
-        if filename.endswith(".png"):
-            # Extrae el nombre del arma del nombre del archivo (ej: 'weapon_ak47')
-            weapon_name = os.path.splitext(filename)[0]
-            try:
-                # Carga la imagen en escala de grises
-                path = os.path.join(RECOIL_PATTERNS_DIR, filename)
-                img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
-                if img is not None:
-                    recoil_patterns[weapon_name] = img
-                    print(f"  ✅ Patrón '{weapon_name}' cargado.")
-                else:
-                    print(f"  ❌ Error al cargar '{filename}'.")
-            except Exception as e:
-                print(f"  ❌ Error procesando '{filename}': {e}")
+    patrones = ConjuntoPatrones.cargar(canvas.shape, RECOIL_PATTERNS_DIR)
     print("-" * 20)
 
+def on_patrones_recargados(nuevo):
+    """
+    Llamado desde el hilo del vigilante. La asignación es atómica: el spray
+    en curso sigue usando patrones_spray y el siguiente toma el conjunto nuevo.
+    """
+    global patrones
+    patrones = nuevo
+
 # --- Funciones de Callback (Slots y Handlers) ---
 
 def on_weapon_changed(weapon_name):
@@ -80,132 +112,270 @@ def on_weapon_changed(weapon_name):
 
 def handle_mouse_move(dx, dy):
     """Guarda los deltas del ratón y actualiza el overlay."""
+    m_mouse_events.inc()
     if tracking:
+        anterior = (overlay.position[0], overlay.position[1])
         overlay.draw_line_from_delta(dx, dy)
+        elapsed_ms = (time.time() - click_start_time) * 1000
+        trazo_tiempos.append(elapsed_ms)
+        dy_canvas = -dy if overlay.invert_y else dy
+        trazo_deltas.append((dx, dy_canvas))
+        trazo_posicion[0] += dx * overlay.sensitivity
+        trazo_posicion[1] += dy_canvas * overlay.sensitivity
+        simplificador_spray.agregar(elapsed_ms, trazo_posicion[0], trazo_posicion[1])
+        if segmentador is not None and segmentador.presionado:
+            ahora_ms = time.time() * 1000
+            cerrado, abierto = segmentador.mover(ahora_ms, dx, dy, municion_gsi())
+            if cerrado is not None:
+                if puntuador is not None and cerrado.fin_ms >= ahora_ms:
+                    puntuar_evento(ahora_ms)  # el evento que lo cerró todavía le pertenece
+                reportar_segmento(cerrado)
+                if abierto is None:
+                    overlay.detener_guia()
+            if abierto is not None:
+                abrir_segmento(abierto, anterior, ahora_ms)
+            if puntuador is not None:
+                puntuar_evento(ahora_ms)
 
 def handle_left_down():
     """Inicia el tracking y el temporizador."""
-    global tracking, request_reset, click_start_time
+    global tracking, click_start_time, puntuador, patrones_spray
+    m_clicks.inc()
     if current_weapon:
+        patrones_spray = patrones
         tracking = True
-        request_reset = True
+        # Canvas y posición limpios antes de procesar el primer movimiento del
+        # clic (pueden llegar en el mismo lote de eventos)
+        canvas[:] = 0
+        position[:] = [WIDTH // 2, HEIGHT // 2]
+        overlay.reset_position()
+        overlay.refresh()
         click_start_time = time.time() # <-- Inicia el cronómetro
+        trazo_tiempos.clear()
+        trazo_deltas.clear()
+        trazo_posicion[:] = [0.0, 0.0]
+        simplificador_spray.reset(0.0, 0.0, 0.0)
+        puntuador = None
+        patron = patrones_spray.patrones_arma.get(current_weapon)
+        if patron is not None:
+            preparar_segmentador(patron)
+            seg = segmentador.presionar(click_start_time * 1000, municion_gsi())
+            abrir_segmento(seg, (overlay.position[0], overlay.position[1]), click_start_time * 1000)
         
         print("Tracking iniciado.")
     else:
         print("⚠️ No hay arma activa detectada.")
 
+def preparar_segmentador(patron):
+    """Crea o reconfigura el segmentador cuando cambia el arma (o se recarga su patrón)."""
+    global segmentador, segmentador_patron
+    if segmentador is None:
+        segmentador = SegmentadorDisparos(patron.cadencia_ms, len(patron.puntos))
+    elif segmentador_patron is not patron:
+        segmentador.configurar(patron.cadencia_ms, len(patron.puntos))
+    segmentador_patron = patron
+
+def abrir_segmento(seg, origen, ahora_ms):
+    """Empieza a puntuar y guiar un segmento desde su primera bala, que salió en `origen`."""
+    global puntuador, segmento, segmento_origen
+    segmento = seg
+    segmento_origen = origen
+    puntuador = patrones_spray.puntuadores.get(segmentador_patron.nombre)
+    if puntuador is not None:
+        puntuador.reset(seg.bala_inicial)
+    overlay.iniciar_guia(segmentador_patron, seg.bala_inicial, origen, ahora_ms - seg.inicio_ms)
+
+def puntuar_evento(ahora_ms):
+    """Pasa la posición actual, relativa al inicio del segmento, al puntuador."""
+    puntuador.actualizar(ahora_ms - segmento.inicio_ms,
+                         overlay.position[0] - segmento_origen[0], overlay.position[1] - segmento_origen[1])
+
+def reportar_segmento(seg):
+    """Muestra el puntaje de un segmento cerrado contra su tramo del patrón."""
+    global puntuador
+    if puntuador is None:
+        return
+    r = puntuador.finalizar()
+    puntuador = None  # Lo que siga hasta soltar ya no pertenece al segmento
+    linea = (f"⚡ {seg.tipo.capitalize()} (balas {seg.bala_inicial + 1}-{seg.bala_inicial + seg.balas}, {seg.motivo})"
+             f" -> error medio {r['error_medio']:.1f} px, máx {r['error_max']:.1f} px")
+    if r["coincidencia"] is not None:
+        linea += f", sobre el patrón {r['coincidencia']:.1%}"
+    print(linea)
+
+def puntaje(comparador, user_bits):
+    """Devuelve (precisión, cobertura) de un trazo empaquetado contra el patrón."""
+    coinciden, solo_usuario, _ = comparador.comparar(user_bits)
+    dibujados = coinciden + solo_usuario
+    precision = coinciden / dibujados if dibujados else 0.0
+    cobertura = coinciden / comparador.pattern_count if comparador.pattern_count else 0.0
+    return precision, cobertura
+
+def gsi_disponible():
+    """True si GSI envió algún payload en los últimos GSI_TIMEOUT_S segundos."""
+    ultimo = GsiHandler.last_update
+    return ultimo is not None and time.time() - ultimo < GSI_TIMEOUT_S
+
+def municion_gsi():
+    """
+    Munición del cargador según GSI, o None si GSI no está al día o su arma
+    activa no es la que se está analizando (el valor nunca se borra).
+    """
+    if not gsi_disponible() or GsiHandler.current_weapon != current_weapon:
+        return None
+    return GsiHandler.current_ammo
+
+def arma_para_analisis(duration_ms):
+    """
+    Arma contra la que se compara el spray: la de GSI si está al día; si no,
+    la que identifica el clasificador a partir de la forma del trazo.
+    """
+    clasificador = patrones_spray.clasificador
+    if clasificador is None or not trazo_deltas:
+        return current_weapon
+    posiciones = np.cumsum(np.asarray(trazo_deltas, dtype=np.float32), axis=0)
+    arma, confianza, _ = clasificador.clasificar(posiciones, duration_ms)
+    if gsi_disponible():
+        if arma and arma != current_weapon and confianza >= CONFIANZA_MIN_CLASIFICADOR:
+            print(f"⚠️  GSI indica '{current_weapon}' pero el trazo se parece a '{arma}' ({confianza:.0%})")
+        return current_weapon
+    if arma and confianza >= CONFIANZA_MIN_CLASIFICADOR:
+        print(f"🔎 GSI no disponible: arma identificada por forma '{arma}' ({confianza:.0%})")
+        return arma
+    print(f"⚠️  GSI no disponible y forma ambigua; se usa '{current_weapon}'")
+    return current_weapon
+
+def spray_a_guardar(weapon):
+    """
+    Spray del clic actual. Salvo GUARDAR_TRAZO_COMPLETO, se guardan solo los
+    vértices del simplificador temporal: interpolados en el tiempo quedan a
+    menos de la tolerancia de cada evento, así el error por bala recalculado
+    desde disco coincide con el de todos los eventos.
+    """
+    spray = Spray(weapon, trazo_tiempos, trazo_deltas, overlay.sensitivity)
+    if GUARDAR_TRAZO_COMPLETO or not trazo_deltas:
+        return spray
+    simplificador_spray.finalizar()
+    indices = simplificador_spray.indices
+    reducido = spray.simplificado(indices)
+    ratio = len(spray.deltas) / max(1, len(reducido.deltas))
+    error = error_sincronico(np.concatenate(([0.0], spray.tiempos_ms)), spray.posiciones(), indices)
+    m_compresion.set(ratio)
+    m_error_simplificacion.set(error)
+    print(f"✂️  Trazo simplificado: {len(spray.deltas)} -> {len(reducido.deltas)} puntos "
+          f"(x{ratio:.1f}, error máx {error:.2f} px)")
+    return reducido
+
 mask_win = MaskWindow(title="Spray Collage")
 mask_win.show()
 mask_windows = []
 def handle_left_up():
     """Detiene el tracking, realiza la comparación y resetea variables."""
-    global tracking, request_reset
+    with m_left_up.cronometrar():
+        _handle_left_up()
+
+def _handle_left_up():
+    global tracking, puntuador, patrones_spray
     
     if not tracking:
         return
     
-    duration_ms = (time.time() - click_start_time) * 1000
+    ahora = time.time()
+    duration_ms = (ahora - click_start_time) * 1000
+
+    # Cada segmento (tap, ráfaga o spray) se puntúa contra su tramo del patrón;
+    # el resultado incremental ya está calculado, finalizar es O(1)
+    if segmentador is not None:
+        seg = segmentador.soltar(ahora * 1000)
+        if seg is not None:
+            reportar_segmento(seg)
 
     if duration_ms > COMPARISON_THRESHOLD_MS:
         print(f"\nClick mantenido por {int(duration_ms)} ms. Analizando spray...")
 
-        # Guardar el canvas actual
+        # Guardar el canvas actual (con la cola del trazo ya dibujada)
+        overlay.cerrar_trazo()
         overlay.save_canvas()
 
-        if current_weapon in recoil_patterns and overlay.saved_canvas is not None:
-            # --- Cargar patrón de recoil con transparencia ---
-            pattern_img = cv2.imread(f"{RECOIL_PATTERNS_DIR}/{current_weapon}.png", cv2.IMREAD_UNCHANGED)
-            if pattern_img.shape[2] == 4:
-                pattern_mask = pattern_img[:, :, 3] > 0
-            else:
-                pattern_mask = pattern_img[:, :, 0] > 0
-
-            ph, pw = pattern_mask.shape
-            ch, cw, _ = overlay.saved_canvas.shape
-
-            # === Origen en el patrón: (pw//2, 0)
-            pattern_origin = (pw // 2, 0)
-
-            # === Origen en el canvas del usuario: centro del overlay
-            user_origin = (cw // 2, ch // 2)
-
-            # --- Calcular límites necesarios para expandir canvas ---
-            min_x = min(-pattern_origin[0], -user_origin[0])
-            min_y = min(0, -user_origin[1])  # patrón empieza en Y=0
-            max_x = max(pw - pattern_origin[0], cw - user_origin[0])
-            max_y = max(ph - pattern_origin[1], ch - user_origin[1])
-
-            # Tamaño del canvas expandido
-            canvas_w = max_x - min_x
-            canvas_h = max_y - min_y
-
-            # Offset para usuario y patrón dentro del canvas expandido
-            user_offset_x = -min_x + (0 - user_origin[0])
-            user_offset_y = -min_y + (0 - user_origin[1])
-            pattern_offset_x = -min_x + (0 - pattern_origin[0])
-            pattern_offset_y = -min_y + (0 - pattern_origin[1])
+        weapon = arma_para_analisis(duration_ms)
 
-            # --- Canvas expandido del usuario ---
-            expanded_user = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
-            expanded_user[user_offset_y:user_offset_y+ch, user_offset_x:user_offset_x+cw] = overlay.saved_canvas
-            user_mask = expanded_user[:, :, 3] > 0
+        comparador = patrones_spray.comparadores.get(weapon)
+        if comparador is not None and overlay.saved_canvas is not None:
 
-            # --- Canvas expandido del patrón ---
-            expanded_pattern = np.zeros((canvas_h, canvas_w), dtype=np.uint8)
-            expanded_pattern[pattern_offset_y:pattern_offset_y+ph, pattern_offset_x:pattern_offset_x+pw] = pattern_mask.astype(np.uint8)
+            user_mask = overlay.saved_canvas[:, :, 3] > 0
 
+            # --- Máscara del usuario empaquetada (1 bit por píxel) ---
+            user_bits = comparador.empaquetar_usuario(user_mask)
 
-            # --- Crear máscara RGB ---
-            mask_img = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
+            # --- Mejor alineación (traslación/escala) por correlación FFT ---
+            (dx, dy), escala, aligned_bits = comparador.alinear(user_mask, ESCALAS_ALINEACION)
 
-            # Verde donde coinciden (patrón + usuario)
-            mask_img[(expanded_pattern > 0) & (user_mask > 0)] = [0, 255, 0, 255]
+            # --- Conteos por AND / ANDNOT + popcount ---
+            precision, cobertura = puntaje(comparador, user_bits)
+            precision_al, cobertura_al = puntaje(comparador, aligned_bits)
+            print(f"🎯 Sin alinear  -> Precisión: {precision:.1%}  Cobertura: {cobertura:.1%}")
+            print(f"🎯 Alineado     -> Precisión: {precision_al:.1%}  Cobertura: {cobertura_al:.1%}"
+                  f"  (desplazamiento {dx:+d},{dy:+d} px, escala {escala:.2f})")
 
-            # Rojo donde usuario dibujó pero no hay patrón
-            mask_img[(expanded_pattern == 0) & (user_mask > 0)] = [255, 0, 0, 255]
+            # --- Mostrar ventana (la imagen solo se construye si se ve) ---
+            if mask_win.isVisible():
+                mask_win.add_image(comparador.visualizar(aligned_bits))
+            m_sprays.inc()
 
-            # Azul donde hay patrón pero el usuario no lo tocó (opcional)
-            mask_img[(expanded_pattern > 0) & (user_mask == 0)] = [0, 0, 255, 255]
-
-            # --- Mostrar ventana ---
-            mask_win.add_image(mask_img)
+            if GUARDAR_SPRAYS:
+                guardar_spray(spray_a_guardar(weapon))
+            if coach is not None:
+                # Al coach va el trazo completo: es quien puntúa
+                coach.enviar(Spray(weapon, trazo_tiempos, trazo_deltas, overlay.sensitivity))
 
         else:
             print("❌ No hay patrón de recoil o canvas guardado.")
 
     # --- Resetear variables ---
+    puntuador = None
+    patrones_spray = None
+    overlay.detener_guia()
     overlay.canvas[:] = 0
     overlay.position[:] = [WIDTH // 2, HEIGHT // 2]
     overlay.reset_position()
     overlay.refresh()
     tracking = False
-    request_reset = False
 
 
 
 
 
 def iniciar_servidor():
-    puerto = 54322
+    puerto = GSI_PORT
     with socketserver.TCPServer(("", puerto), GsiHandler) as httpd:
         print(f"Servidor GSI escuchando en http://localhost:{puerto}")
         httpd.serve_forever()
 
+def iniciar_servidor_metricas():
+    puerto = METRICS_PORT
+    with socketserver.TCPServer(("127.0.0.1", puerto), MetricsHandler) as httpd:
+        print(f"Métricas en http://localhost:{puerto}/metrics")
+        httpd.serve_forever()
+
 # --- Función Principal ---
 
 def main():
-    global request_reset, tracking
+    global coach
     
     # 0. Cargar los patrones de recoil al inicio
     load_recoil_patterns()
+    if RECARGA_EN_CALIENTE and os.path.exists(RECOIL_PATTERNS_DIR):
+        VigilantePatrones(patrones, on_patrones_recargados).iniciar()
     
     # 1. Iniciar el servidor GSI
     GsiHandler.callback = on_weapon_changed
     threading.Thread(target=iniciar_servidor, daemon=True).start()
+    threading.Thread(target=iniciar_servidor_metricas, daemon=True).start()
+    if COACH_HOST:
+        coach = ClienteCoach(COACH_HOST, COACH_PORT, COACH_JUGADOR).iniciar()
     
     # 2. Iniciar el listener del ratón
-    mouse_listener = RawMouseListener(
+    mouse_listener = crear_listener(
         on_mouse_move=handle_mouse_move,
         on_left_down=handle_left_down,
         on_left_up=handle_left_up
@@ -217,29 +387,23 @@ def main():
     print("Mantén pulsado click izquierdo para controlar el spray.")
 
     # 4. Bucle principal
-    msg = wintypes.MSG()
-    user32 = ctypes.windll.user32
-    PM_REMOVE = 0x0001
-    
     try:
         while overlay.isVisible():
-            if user32.PeekMessageA(ctypes.byref(msg), mouse_listener.hwnd, 0, 0, PM_REMOVE):
-                user32.TranslateMessage(ctypes.byref(msg))
-                user32.DispatchMessageA(ctypes.byref(msg))
-
-            if request_reset:
-                # Guardar canvas antes de limpiar si hubo tracking
-                canvas[:] = 0
-                position[:] = [WIDTH // 2, HEIGHT // 2]
-                overlay.reset_position()
-                request_reset = False
-                overlay.refresh()
-
+            # Drenar todos los eventos de entrada pendientes antes de procesar Qt
+            pendientes = mouse_listener.poll()
+            m_mensajes.inc(pendientes)
+            m_cola.set(pendientes)
             app.processEvents()
 
+            # Dormir hasta el próximo evento de entrada o cuadro programado
+            espera = overlay.scheduler.espera_s()
+            mouse_listener.esperar(ESPERA_MAX_S if espera is None else min(espera, ESPERA_MAX_S))
+            overlay.scheduler.atender()
+
     except KeyboardInterrupt:
         print("Saliendo...")
     finally:
+        mouse_listener.close()
         app.quit()
 
 if __name__ == "__main__":
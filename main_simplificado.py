@@ -1,14 +1,13 @@
 import sys
-import ctypes
-from ctypes import wintypes
 from PyQt5 import QtWidgets
 from overlay import OverlayWindow
-from mouse import RawMouseListener
+from backend_entrada import crear_listener
 import numpy as np
 
 # --- Configuración ---
 WIDTH, HEIGHT = 300, 600
 CENTER = (WIDTH // 2, HEIGHT // 2)
+ESPERA_MAX_S = 0.01  # Tope de la espera del bucle (eventos de Qt que no pasan por el backend)
 position = list(CENTER)
 tracking = False
 
@@ -27,8 +26,12 @@ def handle_mouse_move(dx, dy):
         overlay.draw_line_from_delta(dx, dy)
 
 def handle_left_down():
-    """Inicia el tracking."""
+    """Inicia el tracking desde un canvas limpio, antes del primer movimiento del clic."""
     global tracking
+    overlay.canvas[:] = 0
+    overlay.position[:] = [WIDTH // 2, HEIGHT // 2]
+    overlay.reset_position()
+    overlay.refresh()
     tracking = True
 
 def handle_left_up():
@@ -48,7 +51,7 @@ def main():
     global tracking
 
     # Iniciar listener del mouse
-    mouse_listener = RawMouseListener(
+    mouse_listener = crear_listener(
         on_mouse_move=handle_mouse_move,
         on_left_down=handle_left_down,
         on_left_up=handle_left_up
@@ -58,20 +61,18 @@ def main():
     # Mostrar overlay
     overlay.show()
 
-    # Bucle principal Qt + mensajes Windows
-    msg = wintypes.MSG()
-    user32 = ctypes.windll.user32
-    PM_REMOVE = 0x0001
-
+    # Bucle principal Qt + eventos del backend de entrada
     try:
         while overlay.isVisible():
-            if user32.PeekMessageA(ctypes.byref(msg), mouse_listener.hwnd, 0, 0, PM_REMOVE):
-                user32.TranslateMessage(ctypes.byref(msg))
-                user32.DispatchMessageA(ctypes.byref(msg))
+            mouse_listener.poll()
             app.processEvents()
+            espera = overlay.scheduler.espera_s()
+            mouse_listener.esperar(ESPERA_MAX_S if espera is None else min(espera, ESPERA_MAX_S))
+            overlay.scheduler.atender()
     except KeyboardInterrupt:
         print("Saliendo...")
     finally:
+        mouse_listener.close()
         app.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+# mascaras.py
+
+import numpy as np
+import cv2
+
+# Colores de la visualización (RGBA) indexados por código: patrón + 2 * usuario
+LUT_COLORES = np.array([
+    [0, 0, 0, 0],        # 0: vacío
+    [0, 0, 255, 255],    # 1: patrón sin tocar por el usuario (azul)
+    [255, 0, 0, 255],    # 2: usuario fuera del patrón (rojo)
+    [0, 255, 0, 255],    # 3: coinciden (verde)
+], dtype=np.uint8)
+
+# Parámetros de la alineación por correlación
+MAX_DESPLAZAMIENTO = 40          # px de búsqueda en cada eje
+SIGMA_ALINEACION = 3.0           # suavizado para que los casi-aciertos correlacionen
+
+if hasattr(np, "bitwise_count"):
+    def popcount(words):
+        """Cantidad de bits a 1 en un array de uint64."""
+        return int(np.bitwise_count(words).sum())
+else:
+    _POPCOUNT_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        """Cantidad de bits a 1 en un array de uint64 (tabla por byte)."""
+        return int(_POPCOUNT_BYTE[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+def mascara_de_imagen(img):
+    """Máscara booleana del patrón: alpha si existe, si no el primer canal."""
+    if img.ndim == 2:
+        return img > 0
+    if img.shape[2] == 4:
+        return img[:, :, 3] > 0
+    return img[:, :, 0] > 0
+
+
+def empaquetar(mask):
+    """
+    Empaqueta una máscara booleana a 1 bit por píxel en palabras uint64.
+    El último word se rellena con ceros.
+    """
+    bits = np.packbits(mask.ravel())
+    resto = (-len(bits)) % 8
+    if resto:
+        bits = np.concatenate((bits, np.zeros(resto, dtype=np.uint8)))
+    return bits.view(np.uint64)
+
+
+def desempaquetar(words, shape):
+    """Inverso de empaquetar(): devuelve la máscara booleana con la forma dada."""
+    n = shape[0] * shape[1]
+    return np.unpackbits(words.view(np.uint8), count=n).reshape(shape).view(bool)
+
+
+class ComparadorMascaras:
+    """
+    Compara el trazo del usuario contra el patrón de un arma usando máscaras
+    empaquetadas. La geometría del canvas expandido y el patrón empaquetado se
+    calculan una sola vez por arma.
+    """
+    def __init__(self, pattern_mask, canvas_shape):
+        ph, pw = pattern_mask.shape
+        ch, cw = canvas_shape[:2]
+
+        # === Origen en el patrón: (pw//2, 0); en el canvas: centro del overlay
+        pattern_origin = (pw // 2, 0)
+        user_origin = (cw // 2, ch // 2)
+
+        # --- Calcular límites necesarios para expandir canvas ---
+        min_x = min(-pattern_origin[0], -user_origin[0])
+        min_y = min(0, -user_origin[1])
+        max_x = max(pw - pattern_origin[0], cw - user_origin[0])
+        max_y = max(ph - pattern_origin[1], ch - user_origin[1])
+
+        self.shape = (max_y - min_y, max_x - min_x)
+        self.canvas_shape = (ch, cw)
+        self.origen = (-min_x, -min_y)  # primer disparo en el canvas expandido (x, y)
+        self.user_offset = (-min_y - user_origin[1], -min_x - user_origin[0])
+        pattern_offset = (-min_y - pattern_origin[1], -min_x - pattern_origin[0])
+
+        expanded = np.zeros(self.shape, dtype=bool)
+        oy, ox = pattern_offset
+        expanded[oy:oy + ph, ox:ox + pw] = pattern_mask
+        self.pattern_bits = empaquetar(expanded)
+        self.pattern_count = popcount(self.pattern_bits)
+        self._espectro_patron = None
+
+    def expandir_usuario(self, user_mask):
+        """Coloca la máscara del usuario en el canvas expandido."""
+        expanded = np.zeros(self.shape, dtype=bool)
+        oy, ox = self.user_offset
+        ch, cw = self.canvas_shape
+        expanded[oy:oy + ch, ox:ox + cw] = user_mask
+        return expanded
+
+    def empaquetar_usuario(self, user_mask):
+        """Coloca la máscara del usuario en el canvas expandido y la empaqueta."""
+        return empaquetar(self.expandir_usuario(user_mask))
+
+    # --- Alineación ---
+
+    def _preparar_espectro(self):
+        """
+        FFT del patrón suavizado, calculada una vez por arma. El tamaño se
+        rellena para que los desplazamientos buscados no den la vuelta.
+        """
+        h, w = self.shape
+        self._fft_shape = (cv2.getOptimalDFTSize(h + MAX_DESPLAZAMIENTO),
+                           cv2.getOptimalDFTSize(w + MAX_DESPLAZAMIENTO))
+        patron = _suavizar(desempaquetar(self.pattern_bits, self.shape))
+        self._espectro_patron = _dft(patron, self._fft_shape)
+        # Índices (circulares) de la ventana de búsqueda
+        rango = np.arange(-MAX_DESPLAZAMIENTO, MAX_DESPLAZAMIENTO + 1)
+        self._ventana = np.ix_(rango % self._fft_shape[0], rango % self._fft_shape[1])
+        self._rango = rango
+
+    def alinear(self, user_mask, escalas=(1.0,)):
+        """
+        Busca la traslación (y opcionalmente la escala respecto al primer
+        disparo) que mejor superpone el trazo sobre el patrón, por correlación
+        cruzada en frecuencia contra el espectro cacheado del patrón.
+
+        Devuelve ((dx, dy), escala, user_bits_alineado).
+        """
+        if self._espectro_patron is None:
+            self._preparar_espectro()
+        expanded = self.expandir_usuario(user_mask).view(np.uint8)
+        ox, oy = self.origen
+        w = self.shape[1]
+        h = self.shape[0]
+
+        mejor = (-1.0, (0, 0), 1.0, expanded)
+        for escala in escalas:
+            if escala == 1.0:
+                candidato = expanded
+            else:
+                M = np.float32([[escala, 0, ox * (1 - escala)], [0, escala, oy * (1 - escala)]])
+                candidato = cv2.warpAffine(expanded, M, (w, h), flags=cv2.INTER_NEAREST)
+            suave = _suavizar(candidato)
+            norma = float(np.sqrt((suave * suave).sum()))
+            if norma == 0:
+                continue
+            espectro = cv2.mulSpectrums(_dft(suave, self._fft_shape), self._espectro_patron, 0, conjB=True)
+            corr = cv2.idft(espectro, flags=cv2.DFT_REAL_OUTPUT)
+            ventana = corr[self._ventana]
+            iy, ix = np.unravel_index(np.argmax(ventana), ventana.shape)
+            puntaje = ventana[iy, ix] / norma
+            if puntaje > mejor[0]:
+                # corr[d] alto => el trazo está desplazado +d respecto al patrón
+                mejor = (puntaje, (-int(self._rango[ix]), -int(self._rango[iy])), escala, candidato)
+
+        _, (dx, dy), escala, candidato = mejor
+        return (dx, dy), escala, empaquetar(_desplazar(candidato, dx, dy))
+
+    def comparar(self, user_bits):
+        """
+        Devuelve (coinciden, solo_usuario, solo_patron) contando bits con
+        AND / ANDNOT sobre palabras de 64 bits.
+        """
+        coinciden = popcount(user_bits & self.pattern_bits)
+        solo_usuario = popcount(user_bits) - coinciden
+        solo_patron = self.pattern_count - coinciden
+        return coinciden, solo_usuario, solo_patron
+
+    def visualizar(self, user_bits):
+        """Construye la imagen RGBA de la comparación en una sola pasada de LUT."""
+        codigos = desempaquetar(user_bits, self.shape).view(np.uint8) << 1
+        codigos |= desempaquetar(self.pattern_bits, self.shape).view(np.uint8)
+        return LUT_COLORES[codigos]
+
+
+def _dft(img, shape):
+    """DFT float32 (formato CCS de OpenCV) con relleno de ceros hasta shape."""
+    relleno = np.zeros(shape, dtype=np.float32)
+    relleno[:img.shape[0], :img.shape[1]] = img
+    return cv2.dft(relleno)
+
+
+def _suavizar(mask):
+    return cv2.GaussianBlur(mask.astype(np.float32), (0, 0), SIGMA_ALINEACION)
+
+
+def _desplazar(mask, dx, dy):
+    """Traslada una máscara rellenando con ceros (sin dar la vuelta)."""
+    out = np.zeros_like(mask)
+    h, w = mask.shape
+    ys, yd = (slice(0, h - dy), slice(dy, h)) if dy >= 0 else (slice(-dy, h), slice(0, h + dy))
+    xs, xd = (slice(0, w - dx), slice(dx, w)) if dx >= 0 else (slice(-dx, w), slice(0, w + dx))
+    out[yd, xd] = mask[ys, xs]
+    return out
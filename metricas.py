@@ -0,0 +1,130 @@
+# metricas.py
+
+import bisect
+import threading
+import time
+
+# Buckets por defecto (segundos) para latencias del trainer
+BUCKETS_POR_DEFECTO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Contador:
+    """Contador monótono. inc() es una suma de enteros, sin locks."""
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.valor = 0
+
+    def inc(self, n=1):
+        self.valor += n
+
+    def muestras(self):
+        yield self.nombre, self.valor
+
+
+class Medidor:
+    """Valor instantáneo (gauge)."""
+    tipo = "gauge"
+
+    def __init__(self, nombre, ayuda):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.valor = 0
+
+    def set(self, valor):
+        self.valor = valor
+
+    def muestras(self):
+        yield self.nombre, self.valor
+
+
+class Histograma:
+    """
+    Histograma con buckets fijos. observe() hace una búsqueda binaria y dos
+    sumas; los acumulados de Prometheus se calculan solo al exportar.
+    """
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, buckets=BUCKETS_POR_DEFECTO):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(sorted(buckets))
+        self.conteos = [0] * (len(self.buckets) + 1)  # último = +Inf
+        self.suma = 0.0
+
+    def observe(self, valor):
+        self.conteos[bisect.bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+
+    def cronometrar(self):
+        """Context manager que observa la duración del bloque en segundos."""
+        return _Cronometro(self)
+
+    def muestras(self):
+        acumulado = 0
+        for limite, n in zip(self.buckets, self.conteos):
+            acumulado += n
+            yield f'{self.nombre}_bucket{{le="{limite}"}}', acumulado
+        acumulado += self.conteos[-1]
+        yield f'{self.nombre}_bucket{{le="+Inf"}}', acumulado
+        yield f"{self.nombre}_sum", self.suma
+        yield f"{self.nombre}_count", acumulado
+
+
+class _Cronometro:
+    __slots__ = ("histograma", "inicio")
+
+    def __init__(self, histograma):
+        self.histograma = histograma
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.observe(time.perf_counter() - self.inicio)
+        return False
+
+
+class Registro:
+    """Colección de métricas exportable en formato de texto de Prometheus."""
+
+    def __init__(self):
+        self.metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, clase, nombre, ayuda, *args):
+        with self._lock:
+            metrica = self.metricas.get(nombre)
+            if metrica is None:
+                metrica = clase(nombre, ayuda, *args)
+                self.metricas[nombre] = metrica
+            return metrica
+
+    def contador(self, nombre, ayuda=""):
+        return self._registrar(Contador, nombre, ayuda)
+
+    def medidor(self, nombre, ayuda=""):
+        return self._registrar(Medidor, nombre, ayuda)
+
+    def histograma(self, nombre, ayuda="", buckets=BUCKETS_POR_DEFECTO):
+        return self._registrar(Histograma, nombre, ayuda, buckets)
+
+    def exportar(self):
+        """Devuelve todas las métricas en formato de texto de Prometheus."""
+        lineas = []
+        with self._lock:
+            metricas = list(self.metricas.values())
+        for metrica in metricas:
+            if metrica.ayuda:
+                lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            for nombre, valor in metrica.muestras():
+                lineas.append(f"{nombre} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro global del trainer
+REGISTRO = Registro()
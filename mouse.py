@@ -2,6 +2,7 @@
 
 import ctypes
 from ctypes import wintypes
+from backend_entrada import InputBackend
 
 # --- Definiciones y estructuras de la API de Windows ---
 
@@ -24,6 +25,11 @@ WM_DESTROY = 0x0002
 WM_CLOSE = 0x0010
 RI_MOUSE_LEFT_BUTTON_DOWN = 0x0001
 RI_MOUSE_LEFT_BUTTON_UP = 0x0002
+PM_REMOVE = 0x0001
+QS_ALLINPUT = 0x04FF
+MWMO_INPUTAVAILABLE = 0x0004
+WAIT_TIMEOUT = 0x00000102
+INFINITE = 0xFFFFFFFF
 
 WNDPROC = ctypes.WINFUNCTYPE(LRESULT, HWND, UINT, WPARAM, LPARAM)
 
@@ -86,9 +92,13 @@ user32.GetRawInputData.argtypes = [
     ctypes.POINTER(ctypes.c_uint), ctypes.c_uint
 ]
 user32.PostQuitMessage.argtypes = [ctypes.c_int]
+user32.MsgWaitForMultipleObjectsEx.restype = wintypes.DWORD
+user32.MsgWaitForMultipleObjectsEx.argtypes = [
+    wintypes.DWORD, ctypes.c_void_p, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD
+]
 
 
-class RawMouseListener:
+class RawMouseListener(InputBackend):
     """
     Una clase para capturar deltas de movimiento del ratón (raw input) en Windows.
     
@@ -102,11 +112,10 @@ class RawMouseListener:
         :param on_left_down: Función a llamar cuando se presiona el botón izquierdo.
         :param on_left_up: Función a llamar cuando se suelta el botón izquierdo.
         """
-        self.on_mouse_move = on_mouse_move
-        self.on_left_down = on_left_down
-        self.on_left_up = on_left_up
+        super().__init__(on_mouse_move, on_left_down, on_left_up)
         
         self.hwnd = None
+        self._msg = wintypes.MSG()
         # Mantenemos una referencia al WNDPROC para evitar que el recolector de basura lo elimine
         self.wndproc_ptr = WNDPROC(self._wnd_proc)
 
@@ -115,6 +124,24 @@ class RawMouseListener:
         self._create_hidden_window()
         self._register_raw_input()
 
+    def poll(self):
+        """Despacha todos los mensajes pendientes de la ventana oculta."""
+        pendientes = 0
+        while user32.PeekMessageA(ctypes.byref(self._msg), self.hwnd, 0, 0, PM_REMOVE):
+            user32.TranslateMessage(ctypes.byref(self._msg))
+            user32.DispatchMessageA(ctypes.byref(self._msg))
+            pendientes += 1
+        return pendientes
+
+    def esperar(self, timeout=None):
+        """
+        Espera a que llegue cualquier mensaje al hilo (raw input o de Qt, que
+        comparte la cola), incluidos los que ya estaban sin procesar.
+        """
+        ms = INFINITE if timeout is None else max(0, round(timeout * 1000))
+        resultado = user32.MsgWaitForMultipleObjectsEx(0, None, ms, QS_ALLINPUT, MWMO_INPUTAVAILABLE)
+        return resultado != WAIT_TIMEOUT
+
     def _create_hidden_window(self):
         """Crea una ventana invisible para recibir mensajes de Windows."""
         hInstance = kernel32.GetModuleHandleW(None)
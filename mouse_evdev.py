@@ -0,0 +1,162 @@
+# mouse_evdev.py
+
+import os
+import glob
+import select
+import numpy as np
+from backend_entrada import InputBackend
+
+# --- Constantes de linux/input-event-codes.h ---
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_REL = 0x02
+SYN_REPORT = 0
+REL_X = 0x00
+REL_Y = 0x01
+BTN_LEFT = 0x110
+
+# struct input_event { struct timeval time; __u16 type; __u16 code; __s32 value; }
+INPUT_EVENT = np.dtype([
+    ("sec", np.dtype("l")), ("usec", np.dtype("l")),
+    ("type", np.uint16), ("code", np.uint16), ("value", np.int32),
+])
+EVENT_SIZE = INPUT_EVENT.itemsize
+
+EVENTOS_POR_LECTURA = 1024
+
+
+def buscar_dispositivo_raton():
+    """Devuelve la ruta evdev del primer ratón encontrado (o None)."""
+    candidatos = sorted(glob.glob("/dev/input/by-id/*-event-mouse"))
+    candidatos += sorted(glob.glob("/dev/input/by-path/*-event-mouse"))
+    return candidatos[0] if candidatos else None
+
+
+class EvdevMouseListener(InputBackend):
+    """
+    Backend de entrada para Linux que lee structs input_event de un
+    dispositivo evdev (o de cualquier descriptor, p.ej. un FIFO con eventos
+    sintéticos).
+
+    Los eventos se leen en bloque con os.readv sobre un buffer preasignado y
+    se decodifican vectorizados con NumPy; los deltas de cada SYN_REPORT se
+    suman en un único evento de movimiento, como hace Raw Input en Windows.
+    """
+    def __init__(self, on_mouse_move=None, on_left_down=None, on_left_up=None,
+                 device=None, fd=None, eventos_por_lectura=EVENTOS_POR_LECTURA):
+        """
+        :param device: Ruta del dispositivo evdev. Si se omite (y no hay fd) se busca uno.
+        :param fd: Descriptor ya abierto a usar en lugar de `device`.
+        """
+        super().__init__(on_mouse_move, on_left_down, on_left_up)
+        self.device = device
+        self.fd = fd
+        self._propio_fd = False
+        self._buffer = bytearray(eventos_por_lectura * EVENT_SIZE)
+        self._vista = memoryview(self._buffer)
+        self._pendiente = 0  # bytes de un paquete incompleto al inicio del buffer
+
+    def setup(self):
+        """Abre el dispositivo (si no se pasó un fd) en modo no bloqueante."""
+        if self.fd is None:
+            device = self.device or buscar_dispositivo_raton()
+            if device is None:
+                raise OSError("No se encontró ningún ratón en /dev/input")
+            self.fd = os.open(device, os.O_RDONLY | os.O_NONBLOCK)
+            self._propio_fd = True
+        else:
+            os.set_blocking(self.fd, False)
+
+    def close(self):
+        if self._propio_fd and self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+
+    def fileno(self):
+        return self.fd
+
+    def poll(self):
+        """Lee y despacha todos los eventos disponibles. Devuelve cuántos se leyeron."""
+        total = 0
+        while True:
+            try:
+                n = os.readv(self.fd, [self._vista[self._pendiente:]])
+            except BlockingIOError:
+                break
+            if n == 0:
+                break  # EOF (FIFO cerrado)
+            total += self._procesar(self._pendiente + n)
+        return total
+
+    def esperar(self, timeout=None):
+        """Espera con select a que el dispositivo tenga eventos."""
+        listo, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(listo)
+
+    def run(self, timeout=None):
+        """Bucle bloqueante: espera eventos con select y los despacha."""
+        while self.fd is not None:
+            listo, _, _ = select.select([self.fd], [], [], timeout)
+            if listo:
+                self.poll()
+
+    def _procesar(self, n_bytes):
+        """Decodifica hasta el último SYN_REPORT del buffer y guarda el resto."""
+        n_eventos = n_bytes // EVENT_SIZE
+        eventos = np.frombuffer(self._buffer, dtype=INPUT_EVENT, count=n_eventos)
+        tipos = eventos["type"]
+        codigos = eventos["code"]
+
+        syn = (tipos == EV_SYN) & (codigos == SYN_REPORT)
+        fin_syn = np.flatnonzero(syn)
+        if len(fin_syn) == 0:
+            corte = 0
+        else:
+            corte = int(fin_syn[-1]) + 1
+            self._despachar(eventos[:corte], syn[:corte])
+
+        # Conservar los eventos sin SYN_REPORT (y bytes sueltos) para la próxima lectura
+        resto = n_bytes - corte * EVENT_SIZE
+        if resto == len(self._buffer):
+            # Buffer lleno sin ningún SYN_REPORT: se descarta para no bloquearse
+            resto = 0
+        elif resto:
+            self._buffer[:resto] = self._buffer[corte * EVENT_SIZE:n_bytes]
+        self._pendiente = resto
+        return corte
+
+    def _despachar(self, eventos, syn):
+        tipos = eventos["type"]
+        codigos = eventos["code"]
+        valores = eventos["value"]
+
+        # Paquete (SYN_REPORT) al que pertenece cada evento
+        paquete = np.cumsum(syn) - syn
+        n_paquetes = int(syn.sum())
+
+        es_x = (tipos == EV_REL) & (codigos == REL_X)
+        es_y = (tipos == EV_REL) & (codigos == REL_Y)
+        dx = np.bincount(paquete[es_x], weights=valores[es_x], minlength=n_paquetes).astype(np.int64)
+        dy = np.bincount(paquete[es_y], weights=valores[es_y], minlength=n_paquetes).astype(np.int64)
+
+        # value 1 = pulsado, 0 = soltado, 2 = autorepetición (ignorada)
+        es_boton = (tipos == EV_KEY) & (codigos == BTN_LEFT) & (valores != 2)
+        boton_paquete = paquete[es_boton]
+        boton_valor = valores[es_boton]
+
+        activos = np.flatnonzero((dx != 0) | (dy != 0))
+        if len(boton_paquete):
+            activos = np.union1d(activos, boton_paquete)
+
+        b = 0
+        for p in activos.tolist():
+            # Igual que en Windows: primero los botones del paquete, luego el movimiento
+            while b < len(boton_paquete) and boton_paquete[b] == p:
+                if boton_valor[b]:
+                    if self.on_left_down:
+                        self.on_left_down()
+                elif self.on_left_up:
+                    self.on_left_up()
+                b += 1
+            if (dx[p] or dy[p]) and self.on_mouse_move:
+                self.on_mouse_move(int(dx[p]), int(dy[p]))
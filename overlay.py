@@ -1,12 +1,19 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
+import time
 import numpy as np
 import cv2
 import json
+from metricas import REGISTRO
+from planificador_cuadros import PlanificadorCuadros
+from simplificador import SimplificadorTrazo
+
+m_frames = REGISTRO.contador("overlay_frames_total", "Frames pintados por el overlay")
+m_lineas = REGISTRO.contador("overlay_lines_drawn_total", "Segmentos del trazo dibujados en el canvas")
 
 WIDTH, HEIGHT = 300, 600
 
 class OverlayWindow(QtWidgets.QWidget):
-    def __init__(self, canvas, position, sensitivity=0.35, invert_y=True, borderless=True):
+    def __init__(self, canvas, position, sensitivity=0.35, invert_y=True, borderless=True, bajo_impacto=False):
         super().__init__()
         self.canvas = canvas
         self.position = position  # posición del mouse
@@ -16,7 +23,20 @@ class OverlayWindow(QtWidgets.QWidget):
         self.invert_y = invert_y
         self.grosor_linea = 2
 
+        # Solo se dibujan los vértices de la polilínea simplificada; el tramo
+        # pendiente (cola) se pinta encima en cada cuadro
+        self.simplificador = SimplificadorTrazo()
+        self.simplificador.reset(self.position[0], self.position[1])
+
         self.saved_canvas = None
+
+        # Estado del modo guía (fantasma del patrón ideal)
+        self.guia_patron = None
+        self.guia_inicio = 0.0     # perf_counter() del inicio del disparo
+        self.guia_elapsed_ms = 0
+        self.guia_offset_ms = 0    # tiempo de la primera bala del segmento dentro del patrón
+        self.guia_origen = (WIDTH // 2, HEIGHT // 2)  # dónde salió esa bala
+        self._fantasmas = {}  # cache de (PatronArma, QPixmap) por arma
         # Configurar ventana
         if borderless:
             self.set_overlay_flags()
@@ -28,6 +48,11 @@ class OverlayWindow(QtWidgets.QWidget):
         # Centrar ventana en pantalla
         self.center_on_screen()
 
+        # Label del fantasma (debajo del trazo del usuario)
+        self.ghost_label = QtWidgets.QLabel(self)
+        self.ghost_label.setFixedSize(WIDTH, HEIGHT)
+        self.ghost_label.hide()
+
         # Label para mostrar el pixmap
         self.label = QtWidgets.QLabel(self)
         self.pixmap = QtGui.QPixmap(WIDTH, HEIGHT)
@@ -35,10 +60,24 @@ class OverlayWindow(QtWidgets.QWidget):
         self.label.setPixmap(self.pixmap)
         self.label.show()
 
-        # Timer para refrescar la ventana
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.refresh)
-        self.timer.start(16)  # ~60 FPS
+        # Marcador del punto objetivo y texto de desviación
+        self.target_label = QtWidgets.QLabel(self)
+        self.target_label.setFixedSize(8, 8)
+        self.target_label.setStyleSheet("background-color: rgba(255, 0, 255, 200); border-radius: 4px;")
+        self.target_label.hide()
+        self.deviation_label = QtWidgets.QLabel(self)
+        self.deviation_label.setStyleSheet("color: white; font: bold 11px;")
+        self.deviation_label.setFixedWidth(WIDTH)
+        self.deviation_label.move(4, 4)
+        self.deviation_label.hide()
+
+        # Repintado sincronizado con el monitor, solo cuando hay cambios
+        self.scheduler = PlanificadorCuadros(self.refresh, self, bajo_impacto=bajo_impacto,
+                                             animando=lambda: self.guia_patron is not None)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.scheduler.conectar_pantalla()
     
     def save_canvas(self):
         """Guarda una copia del canvas actual para uso posterior."""
@@ -67,12 +106,22 @@ class OverlayWindow(QtWidgets.QWidget):
 
     def refresh(self):
         """Refresca el overlay a partir del canvas RGBA."""
+        m_frames.inc()
         height, width, channel = self.canvas.shape
         bytes_per_line = channel * width
         image = QtGui.QImage(self.canvas.data, width, height, bytes_per_line, QtGui.QImage.Format_RGBA8888)
         self.pixmap = QtGui.QPixmap.fromImage(image)
+        cola = self.simplificador.cola
+        if cola is not None:
+            (x0, y0), (x1, y1) = cola
+            painter = QtGui.QPainter(self.pixmap)
+            painter.setPen(QtGui.QPen(QtGui.QColor(0, 255, 0), self.grosor_linea))
+            painter.drawLine(int(x0), int(y0), int(x1), int(y1))
+            painter.end()
         self.label.setPixmap(self.pixmap)
         self.label.update()
+        if self.guia_patron is not None:
+            self._pintar_guia()
       
     def draw_line_from_delta(self, dx, dy):
         """Dibuja una línea desde la posición actual usando dx/dy."""
@@ -82,10 +131,84 @@ class OverlayWindow(QtWidgets.QWidget):
         ny = self.position[1] + dy * self.sensitivity
         nx = max(0, min(WIDTH-1, nx))
         ny = max(0, min(HEIGHT-1, ny))
-        cv2.line(self.canvas, (int(self.position[0]), int(self.position[1])), (int(nx), int(ny)), (0,255,0,255), self.grosor_linea)
+        if self.simplificador.agregar(nx, ny) is not None:
+            self._dibujar_ultimo_tramo()
         self.position[0], self.position[1] = nx, ny
+        self.scheduler.marcar_sucio()
+
+    def _dibujar_ultimo_tramo(self):
+        """Dibuja en el canvas el segmento hasta el vértice recién fijado."""
+        (x0, y0), (x1, y1) = self.simplificador.vertices[-2:]
+        cv2.line(self.canvas, (int(x0), int(y0)), (int(x1), int(y1)), (0,255,0,255), self.grosor_linea)
+        m_lineas.inc()
+
+    def cerrar_trazo(self):
+        """Fija la cola del trazo en el canvas (antes de guardarlo o compararlo)."""
+        if self.simplificador.finalizar() is not None:
+            self._dibujar_ultimo_tramo()
 
     def reset_position(self):
         self.recoil_position[:] = [WIDTH // 2, HEIGHT // 2]
-        
-        
+        self.simplificador.reset(self.position[0], self.position[1])
+
+    # --- Modo guía ---
+
+    def iniciar_guia(self, patron, bala_inicial=0, origen=None, transcurrido_ms=0):
+        """
+        Muestra el fantasma del patrón del arma mientras se mantiene el disparo.
+
+        :param bala_inicial: Primera bala del segmento (si continúa el patrón).
+        :param origen: Posición (x, y) de esa bala en el overlay (por defecto, el centro).
+        :param transcurrido_ms: Tiempo que ya pasó desde esa bala.
+        """
+        # Si el patrón se recargó, el objeto cambia y se vuelve a rasterizar
+        guardado = self._fantasmas.get(patron.nombre)
+        pixmap = guardado[1] if guardado is not None and guardado[0] is patron else None
+        if pixmap is None:
+            # Rasterizado una sola vez por arma
+            fantasma = patron.preparar_fantasma((WIDTH, HEIGHT), (WIDTH // 2, HEIGHT // 2))
+            image = QtGui.QImage(fantasma.data, WIDTH, HEIGHT, 4 * WIDTH, QtGui.QImage.Format_RGBA8888)
+            pixmap = QtGui.QPixmap.fromImage(image)
+            self._fantasmas[patron.nombre] = (patron, pixmap)
+        self.guia_patron = patron
+        self.guia_inicio = time.perf_counter() - transcurrido_ms / 1000
+        self.guia_elapsed_ms = transcurrido_ms
+        self.guia_offset_ms = bala_inicial * patron.cadencia_ms
+        self.guia_origen = (WIDTH // 2, HEIGHT // 2) if origen is None else (origen[0], origen[1])
+        # El fantasma está rasterizado con la bala 0 en el centro: se corre para
+        # que la bala inicial caiga en el origen
+        bx, by = patron.puntos[min(bala_inicial, len(patron.puntos) - 1)]
+        self.ghost_label.move(int(round(self.guia_origen[0] - WIDTH // 2 - bx)),
+                              int(round(self.guia_origen[1] - HEIGHT // 2 - by)))
+        self.ghost_label.setPixmap(pixmap)
+        self.ghost_label.show()
+        self.target_label.show()
+        self.deviation_label.show()
+        self.scheduler.marcar_sucio()
+
+    def detener_guia(self):
+        self.guia_patron = None
+        self.ghost_label.hide()
+        self.target_label.hide()
+        self.deviation_label.hide()
+
+    def posicion_objetivo(self):
+        """Posición (x, y) en el overlay donde debería estar la mira ahora."""
+        patron = self.guia_patron
+        ex, ey = patron.posicion_esperada(self.guia_offset_ms + self.guia_elapsed_ms)
+        bx, by = patron.posicion_esperada(self.guia_offset_ms)
+        return self.guia_origen[0] + ex - bx, self.guia_origen[1] + ey - by
+
+    def desviacion_actual(self):
+        """Devuelve (dx, dy) entre la posición actual y la esperada, en píxeles."""
+        tx, ty = self.posicion_objetivo()
+        return self.position[0] - tx, self.position[1] - ty
+
+    def _pintar_guia(self):
+        # El objetivo avanza con el reloj aunque no lleguen eventos del ratón
+        self.guia_elapsed_ms = (time.perf_counter() - self.guia_inicio) * 1000
+        tx, ty = self.posicion_objetivo()
+        tx, ty = int(tx), int(ty)
+        self.target_label.move(tx - 4, ty - 4)
+        dx, dy = self.desviacion_actual()
+        self.deviation_label.setText(f"Desvío: {dx:+.0f}, {dy:+.0f} px ({(dx * dx + dy * dy) ** 0.5:.0f})")
@@ -0,0 +1,152 @@
+# patrones.py
+
+import os
+import json
+import numpy as np
+import cv2
+from codec_trazos import leer_registros, puntos_de_registro
+
+RECOIL_PATTERNS_DIR = "recoil_json"
+
+# Cadencia de disparo por arma (ms entre balas)
+CADENCIA_MS = {
+    "weapon_ak47": 100,
+    "weapon_m4a1": 90,
+    "weapon_m4a1_silencer": 100,
+    "weapon_m4a1_silencer_off": 100,
+    "weapon_famas": 90,
+    "weapon_galilar": 90,
+    "weapon_aug": 90,
+    "weapon_aug_scoped": 90,
+    "weapon_sg556": 90,
+    "weapon_sg556_scoped": 90,
+    "weapon_mp9": 70,
+    "weapon_mac10": 75,
+    "weapon_mp7": 80,
+    "weapon_ump45": 90,
+    "weapon_p90": 70,
+    "weapon_bizon": 80,
+}
+CADENCIA_POR_DEFECTO_MS = 100
+
+# Colores del fantasma (RGBA)
+COLOR_FANTASMA = (255, 255, 255, 90)
+COLOR_BALA = (255, 255, 0, 140)
+
+
+def ruta_trz_vigente(weapon_name, directorio=RECOIL_PATTERNS_DIR):
+    """
+    Ruta del .trz del arma si está al día, si no None. El .trz solo vale si
+    no es más viejo que el JSON: editar el JSON a mano lo deja obsoleto.
+    """
+    path_trz = os.path.join(directorio, f"{weapon_name}.trz")
+    if not os.path.exists(path_trz):
+        return None
+    path_json = os.path.join(directorio, f"{weapon_name}.json")
+    if os.path.exists(path_json) and os.stat(path_json).st_mtime_ns > os.stat(path_trz).st_mtime_ns:
+        return None
+    return path_trz
+
+
+def cargar_puntos(weapon_name, directorio=RECOIL_PATTERNS_DIR):
+    """
+    Lee la secuencia de puntos del arma (del .trz compacto si está al día,
+    si no del JSON) y la devuelve en coordenadas del canvas (Y hacia abajo),
+    relativa al primer disparo.
+    """
+    path_trz = ruta_trz_vigente(weapon_name, directorio)
+    if path_trz is not None:
+        registros = leer_registros(path_trz)
+        puntos = puntos_de_registro(registros[-1]).astype(np.float32)
+    else:
+        path = os.path.join(directorio, f"{weapon_name}.json")
+        with open(path, "r") as f:
+            puntos = np.asarray(json.load(f), dtype=np.float32).reshape(-1, 2)
+    # gif_punto_a_coordenadas guarda Y hacia arriba
+    puntos[:, 1] *= -1
+    return puntos
+
+
+def construir_tabla_esperada(puntos, cadencia_ms):
+    """
+    Precalcula la posición acumulada esperada para cada milisegundo del spray.
+    La bala i sale en i * cadencia_ms; entre balas se interpola linealmente.
+    Devuelve un array (T, 2) float32 donde tabla[t] es la posición en t ms.
+    """
+    if len(puntos) == 0:
+        return np.zeros((1, 2), dtype=np.float32)
+    tiempos_balas = np.arange(len(puntos), dtype=np.float32) * cadencia_ms
+    t = np.arange(int(tiempos_balas[-1]) + 1, dtype=np.float32)
+    tabla = np.empty((len(t), 2), dtype=np.float32)
+    tabla[:, 0] = np.interp(t, tiempos_balas, puntos[:, 0])
+    tabla[:, 1] = np.interp(t, tiempos_balas, puntos[:, 1])
+    return tabla
+
+
+def rasterizar_fantasma(puntos, size, origen, grosor=1):
+    """
+    Dibuja una sola vez el camino ideal de compensación sobre un canvas RGBA
+    transparente del tamaño del overlay.
+    """
+    width, height = size
+    fantasma = np.zeros((height, width, 4), dtype=np.uint8)
+    if len(puntos) == 0:
+        return fantasma
+    pts = np.round(puntos + np.asarray(origen, dtype=np.float32)).astype(np.int32)
+    cv2.polylines(fantasma, [pts.reshape(-1, 1, 2)], False, COLOR_FANTASMA, grosor, cv2.LINE_AA)
+    for x, y in pts:
+        cv2.circle(fantasma, (int(x), int(y)), 2, COLOR_BALA, -1, cv2.LINE_AA)
+    return fantasma
+
+
+class PatronArma:
+    """
+    Datos precalculados de un arma: puntos del patrón, tabla de posiciones
+    esperadas por milisegundo y el fantasma ya rasterizado.
+    """
+    def __init__(self, nombre, puntos, cadencia_ms):
+        self.nombre = nombre
+        self.puntos = puntos
+        self.cadencia_ms = cadencia_ms
+        self.tabla = construir_tabla_esperada(puntos, cadencia_ms)
+        self.fantasma = None
+
+    @property
+    def duracion_ms(self):
+        return len(self.tabla) - 1
+
+    def posicion_esperada(self, elapsed_ms):
+        """Posición esperada (relativa al primer disparo) tras elapsed_ms. O(1)."""
+        idx = int(elapsed_ms)
+        if idx < 0:
+            idx = 0
+        elif idx >= len(self.tabla):
+            idx = len(self.tabla) - 1
+        return self.tabla[idx]
+
+    def preparar_fantasma(self, size, origen):
+        """Rasteriza el fantasma para un tamaño de overlay concreto (una vez)."""
+        if self.fantasma is None or self.fantasma.shape[:2] != (size[1], size[0]):
+            self.fantasma = rasterizar_fantasma(self.puntos, size, origen)
+        return self.fantasma
+
+
+def cargar_patrones_arma(directorio=RECOIL_PATTERNS_DIR):
+    """
+    Carga todos los .json de la carpeta de patrones y construye un PatronArma
+    por arma.
+    """
+    patrones = {}
+    if not os.path.exists(directorio):
+        return patrones
+    for filename in os.listdir(directorio):
+        if not filename.endswith(".json"):
+            continue
+        weapon_name = os.path.splitext(filename)[0]
+        try:
+            puntos = cargar_puntos(weapon_name, directorio)
+            cadencia = CADENCIA_MS.get(weapon_name, CADENCIA_POR_DEFECTO_MS)
+            patrones[weapon_name] = PatronArma(weapon_name, puntos, cadencia)
+        except (OSError, ValueError) as e:
+            print(f"  ❌ Error procesando '{filename}': {e}")
+    return patrones
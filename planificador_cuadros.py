@@ -0,0 +1,151 @@
+# planificador_cuadros.py
+
+import collections
+import time
+from PyQt5 import QtCore, QtWidgets
+from metricas import REGISTRO
+
+FPS_BAJO_IMPACTO = 30
+MUESTRAS_ESTADISTICAS = 240
+
+m_frame_time = REGISTRO.histograma(
+    "overlay_frame_interval_seconds", "Tiempo entre cuadros pintados del overlay",
+    buckets=(0.003, 0.005, 0.007, 0.009, 0.012, 0.017, 0.025, 0.034, 0.05, 0.1))
+m_render = REGISTRO.histograma("overlay_render_seconds", "Duración del pintado de un cuadro")
+m_refresh_rate = REGISTRO.medidor("overlay_target_fps", "FPS objetivo del planificador")
+
+
+class PlanificadorCuadros(QtCore.QObject):
+    """
+    Programa los repintados del overlay al ritmo del monitor.
+
+    Solo se pinta si algo marcó el cuadro como sucio desde el último pintado
+    o si hay una animación en curso (p.ej. el objetivo del modo guía, que
+    avanza aunque el ratón esté quieto); sin actividad el timer se detiene.
+    En modo de bajo impacto la frecuencia se limita a FPS_BAJO_IMPACTO.
+
+    Los cuadros se programan contra una fecha límite acumulada en punto
+    flotante, así el ritmo medio es exactamente el del monitor aunque el
+    intervalo no sea un número entero de milisegundos (6.94 ms a 144 Hz).
+    """
+    def __init__(self, render, widget=None, bajo_impacto=False, animando=None):
+        """
+        :param render: Función que pinta un cuadro.
+        :param widget: Ventana cuyo monitor define la frecuencia (si se omite, el principal).
+        :param bajo_impacto: Limitar la frecuencia para equipos modestos.
+        :param animando: Función que devuelve True mientras haya que seguir pintando sin cambios.
+        """
+        super().__init__(widget)
+        self.render = render
+        self.widget = widget
+        self.bajo_impacto = bajo_impacto
+        self.animando = animando
+        self.sucio = False
+        self._ultimo_cuadro = 0.0
+        self._proximo = 0.0  # perf_counter del próximo cuadro programado
+        self.intervalos = collections.deque(maxlen=MUESTRAS_ESTADISTICAS)
+        self.duraciones = collections.deque(maxlen=MUESTRAS_ESTADISTICAS)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._tick)
+
+        self.actualizar_frecuencia()
+
+    def actualizar_frecuencia(self, screen=None):
+        """Lee la frecuencia de refresco del monitor y ajusta el intervalo."""
+        if screen is None:
+            handle = self.widget.windowHandle() if self.widget is not None else None
+            screen = handle.screen() if handle is not None else QtWidgets.QApplication.primaryScreen()
+        hz = screen.refreshRate() if screen is not None else 60.0
+        if not hz or hz <= 0:
+            hz = 60.0
+        if self.bajo_impacto:
+            hz = min(hz, FPS_BAJO_IMPACTO)
+        self.fps_objetivo = hz
+        self.intervalo_ms = 1000.0 / hz
+        m_refresh_rate.set(hz)
+
+    def set_bajo_impacto(self, activo):
+        self.bajo_impacto = activo
+        self.actualizar_frecuencia()
+
+    def conectar_pantalla(self):
+        """Sigue los cambios de monitor de la ventana (llamar tras show())."""
+        handle = self.widget.windowHandle() if self.widget is not None else None
+        if handle is not None:
+            handle.screenChanged.connect(self.actualizar_frecuencia)
+            self.actualizar_frecuencia(handle.screen())
+
+    def marcar_sucio(self):
+        """Pide un cuadro nuevo; se pintará en el próximo slot del monitor."""
+        self.sucio = True
+        if not self.timer.isActive():
+            # Arrancar alineado con el último cuadro para no pintar dos veces en un intervalo
+            self._proximo = self._ultimo_cuadro + self.intervalo_ms / 1000
+            if self._proximo <= time.perf_counter():
+                self._tick()
+            else:
+                self._programar()
+
+    def espera_s(self):
+        """Segundos hasta el próximo cuadro programado, o None si no hay ninguno."""
+        if not self.timer.isActive():
+            return None
+        return max(0.0, self._proximo - time.perf_counter())
+
+    def atender(self):
+        """
+        Pinta el cuadro programado si su fecha límite ya pasó. Para bucles que
+        esperan por su cuenta (ver espera_s): no dependen de que el timer de Qt
+        se despache a tiempo en processEvents().
+        """
+        if self.timer.isActive() and time.perf_counter() >= self._proximo:
+            self.timer.stop()
+            self._tick()
+
+    def _programar(self):
+        """Arma el timer hasta la fecha límite del próximo cuadro."""
+        restante = (self._proximo - time.perf_counter()) * 1000
+        self.timer.start(max(0, round(restante)))
+
+    def _animando(self):
+        return self.animando is not None and self.animando()
+
+    def _tick(self):
+        if not self.sucio and not self._animando():
+            # Sin actividad: detener hasta el próximo marcar_sucio()
+            return
+        self.sucio = False
+        inicio = time.perf_counter()
+        # Próxima fecha límite; si el cuadro llegó muy tarde, realinear en vez de recuperar
+        self._proximo += self.intervalo_ms / 1000
+        if self._proximo <= inicio:
+            self._proximo = inicio + self.intervalo_ms / 1000
+        self._programar()
+        self.render()
+        fin = time.perf_counter()
+        intervalo = inicio - self._ultimo_cuadro
+        # El primer cuadro tras un periodo inactivo no cuenta como intervalo
+        if intervalo * 1000 < 4 * self.intervalo_ms:
+            self.intervalos.append(intervalo)
+            m_frame_time.observe(intervalo)
+        self._ultimo_cuadro = inicio
+        self.duraciones.append(fin - inicio)
+        m_render.observe(fin - inicio)
+
+    def estadisticas(self):
+        """FPS real, intervalo medio/p95 y duración media de pintado (ms) recientes."""
+        if not self.intervalos:
+            return {"fps_objetivo": self.fps_objetivo, "fps": 0.0, "intervalo_ms": 0.0,
+                    "intervalo_p95_ms": 0.0, "render_ms": 0.0}
+        intervalos = sorted(self.intervalos)
+        medio = sum(intervalos) / len(intervalos)
+        return {
+            "fps_objetivo": self.fps_objetivo,
+            "fps": 1.0 / medio if medio else 0.0,
+            "intervalo_ms": medio * 1000,
+            "intervalo_p95_ms": intervalos[int(0.95 * (len(intervalos) - 1))] * 1000,
+            "render_ms": sum(self.duraciones) / len(self.duraciones) * 1000,
+        }
@@ -0,0 +1,158 @@
+# puntuacion.py
+
+import math
+import numpy as np
+import cv2
+
+TOLERANCIA_PX = 4        # distancia al patrón que cuenta como coincidencia
+MARGEN_MAPA = 64         # px alrededor del patrón cubiertos por el mapa de distancias
+DISTANCIA_FUERA = 255.0  # distancia asignada fuera del mapa
+
+
+def mapa_distancias(pattern_mask, margen=MARGEN_MAPA):
+    """
+    Distancia (px) de cada píxel al trazo del patrón, con un margen alrededor.
+    El origen del patrón (pw//2, 0) queda en (pw//2 + margen, margen).
+    """
+    ph, pw = pattern_mask.shape
+    fondo = np.full((ph + 2 * margen, pw + 2 * margen), 255, dtype=np.uint8)
+    fondo[margen:margen + ph, margen:margen + pw][pattern_mask] = 0
+    mapa = cv2.distanceTransform(fondo, cv2.DIST_L2, 3)
+    return mapa, (pw // 2 + margen, margen)
+
+
+def errores_por_bala(posiciones, tiempos_ms, patron):
+    """
+    Versión vectorizada (offline) del error por bala: distancia entre la
+    posición del trazo en el instante de cada bala y el punto del patrón.
+    La posición se interpola linealmente entre los eventos que rodean al
+    disparo, así el resultado casi no cambia entre el trazo completo y los
+    vértices del simplificador. Solo incluye las balas disparadas antes del
+    último evento.
+
+    :param posiciones: (N+1, 2) posiciones relativas al primer disparo (ver Spray.posiciones).
+    :param tiempos_ms: (N,) tiempo de cada evento.
+    """
+    tiempos_ms = np.asarray(tiempos_ms, dtype=np.float64)
+    if len(tiempos_ms) == 0:
+        return np.zeros(0, dtype=np.float32)
+    t_balas = np.arange(len(patron.puntos)) * float(patron.cadencia_ms)
+    n = int(np.searchsorted(t_balas, tiempos_ms[-1], side="right"))
+    # posiciones[0] es el origen, en t = 0
+    t_pos = np.concatenate(([0.0], tiempos_ms))
+    x = np.interp(t_balas[:n], t_pos, posiciones[:, 0])
+    y = np.interp(t_balas[:n], t_pos, posiciones[:, 1])
+    return np.hypot(x - patron.puntos[:n, 0], y - patron.puntos[:n, 1]).astype(np.float32)
+
+
+class PuntuadorStreaming:
+    """
+    Puntaje incremental de un spray. Cada evento de movimiento actualiza
+    sumas acumuladas con trabajo O(1): un índice en la tabla de posiciones
+    esperadas, una lectura del mapa de distancias al patrón y, al cruzar el
+    tiempo de una bala, el error de esa bala. Como en errores_por_bala, la
+    posición en el instante de la bala se interpola entre el evento anterior
+    y el actual. El resultado parcial se puede leer en cualquier momento y
+    finalizar no depende del largo del spray.
+    """
+    def __init__(self, patron, pattern_mask=None, tolerancia=TOLERANCIA_PX):
+        """
+        :param patron: PatronArma con la tabla de posiciones esperadas.
+        :param pattern_mask: Máscara PNG del patrón (opcional) para medir coincidencia.
+        """
+        self.patron = patron
+        self.tolerancia = tolerancia
+        if pattern_mask is not None:
+            self.mapa, self.origen_mapa = mapa_distancias(pattern_mask)
+        else:
+            self.mapa, self.origen_mapa = None, (0, 0)
+        self.error_balas = np.full(len(patron.puntos), np.nan, dtype=np.float32)
+        self._tabla = patron.tabla.tolist()  # floats nativos: indexar es más barato
+        self._puntos = np.asarray(patron.puntos, dtype=np.float64).tolist()
+        self.reset()
+
+    def reset(self, bala_inicial=0):
+        """
+        Empieza un segmento nuevo. Con bala_inicial > 0 el segmento se compara
+        contra el patrón a partir de esa bala (ráfagas que continúan el recoil).
+        """
+        bala_inicial = min(bala_inicial, len(self.error_balas) - 1) if len(self.error_balas) else 0
+        self.bala_inicial = bala_inicial
+        self._offset_ms = int(bala_inicial * self.patron.cadencia_ms)
+        self._base = self._tabla[min(self._offset_ms, len(self._tabla) - 1)]
+        self._anterior = (0.0, 0.0, 0.0)  # (elapsed_ms, x, y) del evento previo; el origen en t = 0
+        self.eventos = 0
+        self.suma_error = 0.0
+        self.suma_error2 = 0.0
+        self.error_max = 0.0
+        self.suma_distancia = 0.0
+        self.coinciden = 0
+        self.balas = bala_inicial
+        self.elapsed_ms = 0.0
+        self.error_balas[:] = np.nan
+
+    def actualizar(self, elapsed_ms, x, y):
+        """Registra la posición (x, y) relativa al inicio del segmento tras elapsed_ms."""
+        tabla = self._tabla
+        idx = int(elapsed_ms) + self._offset_ms
+        if idx >= len(tabla):
+            idx = len(tabla) - 1
+        ex, ey = tabla[idx]
+        dx = x - (ex - self._base[0])
+        dy = y - (ey - self._base[1])
+        error = (dx * dx + dy * dy) ** 0.5
+
+        self.eventos += 1
+        self.elapsed_ms = elapsed_ms
+        self.suma_error += error
+        self.suma_error2 += error * error
+        if error > self.error_max:
+            self.error_max = error
+
+        if self.mapa is not None:
+            # El mapa tiene la bala 0 en origen_mapa; el segmento empieza en _base.
+            # floor (no int) como el canvas, donde las coordenadas son positivas
+            mx = math.floor(x + self._base[0]) + self.origen_mapa[0]
+            my = math.floor(y + self._base[1]) + self.origen_mapa[1]
+            if 0 <= my < self.mapa.shape[0] and 0 <= mx < self.mapa.shape[1]:
+                distancia = float(self.mapa[my, mx])
+            else:
+                distancia = DISTANCIA_FUERA
+            self.suma_distancia += distancia
+            if distancia <= self.tolerancia:
+                self.coinciden += 1
+
+        # Balas cuyo tiempo de disparo ya pasó (amortizado O(1) por evento):
+        # posición interpolada entre el evento previo y este en ese instante
+        cadencia = self.patron.cadencia_ms
+        total = len(self.error_balas)
+        t0, x0, y0 = self._anterior
+        while self.balas < total and self.balas * cadencia <= elapsed_ms + self._offset_ms:
+            t_bala = self.balas * cadencia - self._offset_ms
+            f = (t_bala - t0) / (elapsed_ms - t0) if elapsed_ms > t0 else 1.0
+            px, py = self._puntos[self.balas]
+            bx = x0 + f * (x - x0) - (px - self._base[0])
+            by = y0 + f * (y - y0) - (py - self._base[1])
+            self.error_balas[self.balas] = (bx * bx + by * by) ** 0.5
+            self.balas += 1
+        self._anterior = (elapsed_ms, x, y)
+
+    def parcial(self):
+        """Resumen del spray hasta el momento (O(1))."""
+        n = self.eventos or 1
+        return {
+            "eventos": self.eventos,
+            "bala_inicial": self.bala_inicial,
+            "balas": self.balas - self.bala_inicial,
+            "error_medio": self.suma_error / n,
+            "error_rms": (self.suma_error2 / n) ** 0.5,
+            "error_max": self.error_max,
+            "distancia_media": self.suma_distancia / n if self.mapa is not None else None,
+            "coincidencia": self.coinciden / n if self.mapa is not None else None,
+        }
+
+    def finalizar(self):
+        """Resultado final: el parcial más el error por bala (copia: reset() reutiliza el buffer)."""
+        resultado = self.parcial()
+        resultado["error_balas"] = self.error_balas[self.bala_inicial:self.balas].copy()
+        return resultado
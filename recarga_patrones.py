@@ -0,0 +1,216 @@
+# recarga_patrones.py
+
+import os
+import sys
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+import threading
+import cv2
+
+from patrones import PatronArma, cargar_puntos, CADENCIA_MS, CADENCIA_POR_DEFECTO_MS, RECOIL_PATTERNS_DIR
+from mascaras import ComparadorMascaras, mascara_de_imagen
+from clasificador import ClasificadorArmas
+from puntuacion import PuntuadorStreaming
+from metricas import REGISTRO
+
+EXTENSIONES = (".png", ".json", ".trz")
+DEBOUNCE_S = 0.3          # los scripts de GIF escriben varios archivos por arma
+INTERVALO_POLL_S = 1.0    # fallback sin inotify
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+EVENTO_INOTIFY = struct.Struct("iIII")
+
+m_recargas = REGISTRO.contador("pattern_reloads_total", "Recargas en caliente del set de patrones")
+m_recarga = REGISTRO.histograma("pattern_reload_seconds", "Duración de reconstruir las armas modificadas")
+
+
+class ConjuntoPatrones:
+    """
+    Todo lo precalculado a partir de recoil_json/: imágenes, comparadores de
+    máscaras, tablas de la guía, puntuadores y clasificador. Una vez
+    construido no se modifica; una recarga crea un conjunto nuevo que
+    reutiliza los datos de las armas sin cambios, así quien tenga una
+    referencia (p.ej. el análisis de un spray en curso) conserva su versión.
+    """
+    def __init__(self, canvas_shape, directorio=RECOIL_PATTERNS_DIR):
+        self.canvas_shape = canvas_shape
+        self.directorio = directorio
+        self.recoil_patterns = {}    # imagen PNG por arma
+        self.comparadores = {}       # ComparadorMascaras por arma
+        self.mascaras = {}           # máscara booleana del PNG por arma
+        self.patrones_arma = {}      # PatronArma por arma (modo guía)
+        self.puntuadores = {}        # PuntuadorStreaming por arma
+        self.clasificador = None
+
+    @classmethod
+    def cargar(cls, canvas_shape, directorio=RECOIL_PATTERNS_DIR):
+        """Construye el conjunto completo a partir de la carpeta."""
+        conjunto = cls(canvas_shape, directorio)
+        armas = {os.path.splitext(f)[0] for f in os.listdir(directorio) if f.endswith((".png", ".json"))}
+        for weapon_name in sorted(armas):
+            conjunto._cargar_arma(weapon_name)
+        conjunto._finalizar()
+        return conjunto
+
+    def con_cambios(self, armas):
+        """Nuevo conjunto con las armas indicadas releídas de disco."""
+        nuevo = ConjuntoPatrones(self.canvas_shape, self.directorio)
+        for nombre in ("recoil_patterns", "comparadores", "mascaras", "patrones_arma", "puntuadores"):
+            actual = {w: v for w, v in getattr(self, nombre).items() if w not in armas}
+            setattr(nuevo, nombre, actual)
+        for weapon_name in sorted(armas):
+            nuevo._cargar_arma(weapon_name)
+        nuevo._finalizar()
+        return nuevo
+
+    def _cargar_arma(self, weapon_name):
+        path_png = os.path.join(self.directorio, f"{weapon_name}.png")
+        if os.path.exists(path_png):
+            img = cv2.imread(path_png, cv2.IMREAD_UNCHANGED)
+            if img is not None:
+                self.recoil_patterns[weapon_name] = img
+                self.mascaras[weapon_name] = mascara_de_imagen(img)
+                self.comparadores[weapon_name] = ComparadorMascaras(self.mascaras[weapon_name], self.canvas_shape)
+                print(f"  ✅ Patrón '{weapon_name}' cargado.")
+            else:
+                print(f"  ❌ Error al cargar '{weapon_name}.png'.")
+
+        if os.path.exists(os.path.join(self.directorio, f"{weapon_name}.json")):
+            try:
+                puntos = cargar_puntos(weapon_name, self.directorio)
+                cadencia = CADENCIA_MS.get(weapon_name, CADENCIA_POR_DEFECTO_MS)
+                self.patrones_arma[weapon_name] = PatronArma(weapon_name, puntos, cadencia)
+                print(f"  ✅ Guía '{weapon_name}' precalculada.")
+            except (OSError, ValueError) as e:
+                print(f"  ❌ Error procesando '{weapon_name}.json': {e}")
+
+    def _finalizar(self):
+        for weapon_name, patron in self.patrones_arma.items():
+            if weapon_name not in self.puntuadores:
+                self.puntuadores[weapon_name] = PuntuadorStreaming(patron, self.mascaras.get(weapon_name))
+        self.clasificador = ClasificadorArmas(self.patrones_arma) if self.patrones_arma else None
+
+
+def _cargar_inotify():
+    """libc con inotify (solo Linux); None si no está disponible."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class VigilantePatrones:
+    """
+    Vigila la carpeta de patrones en un hilo aparte (inotify en Linux,
+    sondeo de mtime/tamaño en el resto). Tras un lote de cambios reconstruye
+    solo las armas afectadas y entrega el conjunto nuevo a on_recarga, que lo
+    publica con una simple asignación.
+    """
+    def __init__(self, conjunto, on_recarga, debounce_s=DEBOUNCE_S, intervalo_s=INTERVALO_POLL_S):
+        self.conjunto = conjunto
+        self.directorio = conjunto.directorio
+        self.on_recarga = on_recarga
+        self.debounce_s = debounce_s
+        self.intervalo_s = intervalo_s
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._run, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+
+    def _run(self):
+        libc = _cargar_inotify()
+        fd = -1
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.directorio),
+                                                  IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE) < 0:
+                os.close(fd)
+                fd = -1
+        try:
+            if fd >= 0:
+                print(f"👀 Vigilando '{self.directorio}' (inotify)")
+                self._run_inotify(fd)
+            else:
+                print(f"👀 Vigilando '{self.directorio}' (sondeo cada {self.intervalo_s:g} s)")
+                self._run_sondeo()
+        finally:
+            if fd >= 0:
+                os.close(fd)
+
+    def _run_inotify(self, fd):
+        pendientes = set()
+        while not self._parar.is_set():
+            # Con cambios pendientes se espera solo el debounce; si no, bloquea
+            listos, _, _ = select.select([fd], [], [], self.debounce_s if pendientes else 1.0)
+            if not listos:
+                if pendientes:
+                    self._recargar(pendientes)
+                    pendientes = set()
+                continue
+            try:
+                datos = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(datos):
+                _, _, _, largo = EVENTO_INOTIFY.unpack_from(datos, offset)
+                offset += EVENTO_INOTIFY.size
+                nombre = os.fsdecode(datos[offset:offset + largo].rstrip(b"\0"))
+                offset += largo
+                if nombre.endswith(EXTENSIONES) and not nombre.startswith("."):
+                    pendientes.add(os.path.splitext(nombre)[0])
+
+    def _firmas(self):
+        firmas = {}
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if entrada.name.endswith(EXTENSIONES) and not entrada.name.startswith("."):
+                    st = entrada.stat()
+                    firmas[entrada.name] = (st.st_mtime_ns, st.st_size)
+        return firmas
+
+    def _run_sondeo(self):
+        anteriores = self._firmas()
+        pendientes = set()
+        while not self._parar.wait(self.debounce_s if pendientes else self.intervalo_s):
+            actuales = self._firmas()
+            cambiados = {n for n in actuales.keys() | anteriores.keys() if actuales.get(n) != anteriores.get(n)}
+            anteriores = actuales
+            if cambiados:
+                pendientes |= {os.path.splitext(n)[0] for n in cambiados}
+            elif pendientes:
+                self._recargar(pendientes)
+                pendientes = set()
+
+    def _recargar(self, armas):
+        print(f"🔄 Recargando patrones: {', '.join(sorted(armas))}")
+        inicio = time.perf_counter()
+        try:
+            nuevo = self.conjunto.con_cambios(armas)
+        except Exception as e:
+            # Un archivo a medio escribir no debe tumbar el vigilante
+            print(f"  ❌ Error recargando patrones: {e}")
+            return
+        self.conjunto = nuevo
+        m_recarga.observe(time.perf_counter() - inicio)
+        m_recargas.inc()
+        self.on_recarga(nuevo)
+        print(f"  ✅ {len(armas)} arma(s) actualizadas en {(time.perf_counter() - inicio) * 1000:.0f} ms")
@@ -0,0 +1,260 @@
+# render_sprays.py
+
+import os
+import argparse
+import numpy as np
+import cv2
+from PIL import Image
+
+from mascaras import mascara_de_imagen
+from sprays import cargar_sprays, SPRAYS_DIR
+from simplificador import simplificar
+
+RECOIL_PATTERNS_DIR = "recoil_json"
+OUTPUT_DIR = "renders"
+
+# Celda base (px) y origen del primer disparo dentro de la celda
+CELDA = (300, 450)
+ORIGEN = (CELDA[0] // 2, 30)
+
+# Colores BGR
+COLOR_FONDO = (22, 20, 32)
+COLOR_PATRON = (200, 120, 40)
+COLOR_USUARIO = (80, 255, 80)
+COLOR_TEXTO = (230, 230, 230)
+
+SHIFT = 4  # coordenadas en punto fijo para cv2 (1/16 px)
+
+# Reproducción: cada spray se comprime a lo sumo a este número de cuadros
+# (0 = tiempo real). Un spray de 3 s a 30 FPS serían ~100 cuadros.
+CUADROS_POR_SPRAY = 16
+# Escala por defecto: el grid PNG se ve de cerca; en GIF/MP4 el costo del
+# encoder crece con los píxeles de cada cuadro
+ESCALA_GRID = 2.0
+ESCALA_ANIMACION = 1.0
+# Pillow retiene todos los cuadros de un GIF en memoria: los reels más largos
+# se rechazan (usar MP4, que se codifica en streaming)
+MAX_CUADROS_GIF = 600
+
+
+def cargar_mascaras(directorio=RECOIL_PATTERNS_DIR):
+    """Carga las máscaras booleanas de todos los patrones .png."""
+    mascaras = {}
+    if not os.path.exists(directorio):
+        return mascaras
+    for filename in os.listdir(directorio):
+        if filename.endswith(".png"):
+            img = cv2.imread(os.path.join(directorio, filename), cv2.IMREAD_UNCHANGED)
+            if img is not None:
+                mascaras[os.path.splitext(filename)[0]] = mascara_de_imagen(img)
+    return mascaras
+
+
+class Renderizador:
+    """
+    Rasteriza sprays grabados sobre su patrón con OpenCV. Los fondos (patrón
+    escalado) se generan una vez por arma y cada cuadro solo dibuja los
+    segmentos nuevos.
+    """
+    def __init__(self, mascaras, escala=2.0):
+        self.mascaras = mascaras
+        self.escala = escala
+        self.size = (int(CELDA[0] * escala), int(CELDA[1] * escala))
+        self._fondos = {}
+
+    def fondo(self, weapon):
+        """Celda con el patrón del arma dibujado, cacheada por arma."""
+        fondo = self._fondos.get(weapon)
+        if fondo is None:
+            w, h = self.size
+            fondo = np.empty((h, w, 3), dtype=np.uint8)
+            fondo[:] = COLOR_FONDO
+            mask = self.mascaras.get(weapon)
+            if mask is not None:
+                # Origen del patrón en (pw//2, 0), igual que en la comparación
+                ph, pw = mask.shape
+                M = np.float32([[self.escala, 0, ORIGEN[0] * self.escala - (pw // 2) * self.escala],
+                                [0, self.escala, ORIGEN[1] * self.escala]])
+                mask_u8 = cv2.warpAffine(mask.view(np.uint8), M, (w, h), flags=cv2.INTER_NEAREST)
+                fondo[mask_u8 > 0] = COLOR_PATRON
+            self._fondos[weapon] = fondo
+        return fondo
+
+    def puntos_celda(self, spray):
+        """Posiciones del spray en punto fijo dentro de la celda, (N+1, 1, 2) int32."""
+        pos = spray.posiciones()
+        pos += ORIGEN
+        pos *= self.escala * (1 << SHIFT)
+        return np.round(pos).astype(np.int32).reshape(-1, 1, 2)
+
+    def grosor(self):
+        return max(1, int(round(2 * self.escala)))
+
+    def cuadro_final(self, spray, etiqueta=None):
+        """Celda con el spray completo sobre su patrón."""
+        img = self.fondo(spray.weapon).copy()
+        cv2.polylines(img, [self.puntos_celda(spray)], False, COLOR_USUARIO, self.grosor(), cv2.LINE_AA, SHIFT)
+        if etiqueta:
+            cv2.putText(img, etiqueta, (8, self.size[1] - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.4 * self.escala, COLOR_TEXTO, 1, cv2.LINE_AA)
+        return img
+
+    def paginas_grid(self, sprays, columnas=10, filas=5):
+        """
+        Genera páginas de grid (columnas x filas celdas). Cada página se dibuja
+        con una sola llamada a polylines por arma y se libera antes de la
+        siguiente, así la memoria no depende del total de sprays.
+        """
+        w, h = self.size
+        por_pagina = columnas * filas
+        for inicio in range(0, len(sprays), por_pagina):
+            lote = sprays[inicio:inicio + por_pagina]
+            pagina = np.empty((h * filas, w * columnas, 3), dtype=np.uint8)
+            pagina[:] = COLOR_FONDO
+            lineas = {}
+            for i, spray in enumerate(lote):
+                fy, cx = divmod(i, columnas)
+                pagina[fy * h:(fy + 1) * h, cx * w:(cx + 1) * w] = self.fondo(spray.weapon)
+                pts = self.puntos_celda(spray)
+                pts += np.array([cx * w, fy * h], dtype=np.int32) << SHIFT
+                lineas.setdefault(spray.weapon, []).append(pts)
+                cv2.putText(pagina, f"#{inicio + i + 1} {spray.weapon.replace('weapon_', '')}",
+                            (cx * w + 8, (fy + 1) * h - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.4 * self.escala, COLOR_TEXTO, 1, cv2.LINE_AA)
+            for pts in lineas.values():
+                cv2.polylines(pagina, pts, False, COLOR_USUARIO, self.grosor(), cv2.LINE_AA, SHIFT)
+            yield pagina
+
+    @staticmethod
+    def tiempos_cuadros(spray, fps=30, velocidad=1.0, cola_ms=500, max_cuadros=CUADROS_POR_SPRAY):
+        """
+        Instante (ms del spray) de cada cuadro. Si la reproducción a la
+        velocidad pedida supera max_cuadros, se diezma a max_cuadros cuadros
+        repartidos en toda la duración.
+        """
+        duracion = float(spray.tiempos_ms[-1]) if len(spray.tiempos_ms) else 0.0
+        n_cuadros = int(np.ceil((duracion + cola_ms) / velocidad * fps / 1000)) + 1
+        if max_cuadros and n_cuadros > max_cuadros:
+            return np.linspace(0.0, duracion + cola_ms, max_cuadros)
+        return np.arange(n_cuadros) * (1000.0 * velocidad / fps)
+
+    def cuadros(self, spray, fps=30, velocidad=1.0, cola_ms=500, max_cuadros=CUADROS_POR_SPRAY):
+        """
+        Genera los cuadros de la reproducción de un spray. Los índices de
+        corte por cuadro se calculan de una vez con searchsorted y cada cuadro
+        dibuja solo los segmentos nuevos sobre el anterior.
+        """
+        img = self.fondo(spray.weapon).copy()
+        pts = self.puntos_celda(spray)
+        t_cuadros = self.tiempos_cuadros(spray, fps, velocidad, cola_ms, max_cuadros)
+        # pts[0] es el origen; pts[i + 1] corresponde a tiempos_ms[i]
+        cortes = np.searchsorted(spray.tiempos_ms, t_cuadros, side="right") + 1
+        dibujado = 1
+        for corte in cortes:
+            if corte > dibujado:
+                cv2.polylines(img, [pts[dibujado - 1:corte]], False, COLOR_USUARIO,
+                              self.grosor(), cv2.LINE_AA, SHIFT)
+                dibujado = corte
+            yield img
+
+
+def escribir_grid(renderizador, sprays, prefijo, columnas=10, filas=5):
+    paths = []
+    for n, pagina in enumerate(renderizador.paginas_grid(sprays, columnas, filas), 1):
+        path = f"{prefijo}_{n:03d}.png"
+        cv2.imwrite(path, pagina)
+        paths.append(path)
+    return paths
+
+
+def escribir_video(renderizador, sprays, path, fps=30, velocidad=1.0, max_cuadros=CUADROS_POR_SPRAY):
+    """Codifica la reproducción en MP4 cuadro a cuadro (memoria constante)."""
+    w, h = renderizador.size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    if not writer.isOpened():
+        raise RuntimeError(f"No se pudo abrir el encoder para {path}")
+    try:
+        for spray in sprays:
+            for cuadro in renderizador.cuadros(spray, fps, velocidad, max_cuadros=max_cuadros):
+                writer.write(cuadro)
+    finally:
+        writer.release()
+    return path
+
+
+def escribir_gif(renderizador, sprays, path, fps=20, velocidad=1.0, max_cuadros=CUADROS_POR_SPRAY):
+    """
+    GIF animado con Pillow. Pillow retiene todos los cuadros hasta escribir
+    el archivo, así que los reels de más de MAX_CUADROS_GIF cuadros se
+    rechazan antes de dibujar nada (para esos, MP4).
+    """
+    total = sum(len(renderizador.tiempos_cuadros(s, fps, velocidad, max_cuadros=max_cuadros)) for s in sprays)
+    if total > MAX_CUADROS_GIF:
+        raise ValueError(f"el GIF tendría {total} cuadros (máximo {MAX_CUADROS_GIF}); "
+                         f"usar mp4, --ultimos o menos --cuadros-por-spray")
+
+    def generar():
+        for spray in sprays:
+            for cuadro in renderizador.cuadros(spray, fps, velocidad, max_cuadros=max_cuadros):
+                yield Image.fromarray(cv2.cvtColor(cuadro, cv2.COLOR_BGR2RGB))
+
+    frames = generar()
+    primero = next(frames, None)
+    if primero is None:
+        return None
+    primero.save(path, save_all=True, append_images=frames, duration=int(1000 / fps), loop=0)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render offline de sprays grabados")
+    parser.add_argument("formato", choices=["png", "gif", "mp4"])
+    parser.add_argument("--sprays", default=SPRAYS_DIR)
+    parser.add_argument("--patrones", default=RECOIL_PATTERNS_DIR)
+    parser.add_argument("--salida", default=OUTPUT_DIR)
+    parser.add_argument("--escala", type=float, default=None,
+                        help=f"por defecto {ESCALA_GRID} en png y {ESCALA_ANIMACION} en gif/mp4")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--velocidad", type=float, default=1.0, help="multiplicador de velocidad de reproducción")
+    parser.add_argument("--cuadros-por-spray", type=int, default=CUADROS_POR_SPRAY,
+                        help="máximo de cuadros por spray en gif/mp4 (0 = tiempo real)")
+    parser.add_argument("--weapon", default=None, help="filtrar por arma (ej: weapon_ak47)")
+    parser.add_argument("--ultimos", type=int, default=None, help="solo los N sprays más recientes")
+    parser.add_argument("--simplificar", type=float, default=None, metavar="PX",
+                        help="reducir los trazos con esta tolerancia antes de dibujar")
+    args = parser.parse_args()
+
+    sprays = cargar_sprays(args.sprays)
+    if args.weapon:
+        sprays = [s for s in sprays if s.weapon == args.weapon]
+    if args.ultimos:
+        sprays = sprays[-args.ultimos:]
+    if args.simplificar:
+        sprays = [s.simplificado(simplificar(s.posiciones(), args.simplificar)) for s in sprays]
+    if not sprays:
+        print(f"⚠️  No hay sprays en '{args.sprays}'")
+        return
+
+    os.makedirs(args.salida, exist_ok=True)
+    escala = args.escala or (ESCALA_GRID if args.formato == "png" else ESCALA_ANIMACION)
+    renderizador = Renderizador(cargar_mascaras(args.patrones), escala=escala)
+
+    if args.formato == "png":
+        paths = escribir_grid(renderizador, sprays, os.path.join(args.salida, "grid"))
+        print(f"[OK] {len(sprays)} sprays en {len(paths)} páginas PNG")
+    elif args.formato == "gif":
+        try:
+            path = escribir_gif(renderizador, sprays, os.path.join(args.salida, "sprays.gif"),
+                                args.fps, args.velocidad, args.cuadros_por_spray)
+        except ValueError as e:
+            print(f"⚠️  {e}")
+            return
+        print(f"[OK] GIF guardado en {path}")
+    else:
+        path = escribir_video(renderizador, sprays, os.path.join(args.salida, "sprays.mp4"),
+                              args.fps, args.velocidad, args.cuadros_por_spray)
+        print(f"[OK] Video guardado en {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# segmentador.py
+
+import math
+
+RESET_RECOIL_MS = 400    # pausa tras la cual el patrón vuelve a la primera bala
+PAUSA_MS = 200           # hueco entre eventos del ratón que corta el grupo (sin GSI)
+VENTANA_QUIETO_MS = 150  # ventana del movimiento reciente
+UMBRAL_QUIETO = 3.0      # counts en la ventana por debajo de los cuales el ratón está quieto
+
+
+class Segmento:
+    """
+    Grupo de disparos continuo. Cubre las balas [bala_inicial, bala_inicial +
+    balas) del patrón: si el jugador vuelve a disparar antes de que el recoil
+    se recupere, el nuevo segmento continúa el patrón donde quedó.
+    """
+    __slots__ = ("inicio_ms", "fin_ms", "bala_inicial", "balas", "motivo", "eventos")
+
+    def __init__(self, inicio_ms, bala_inicial):
+        self.inicio_ms = inicio_ms
+        self.fin_ms = inicio_ms
+        self.bala_inicial = bala_inicial
+        self.balas = 1
+        self.motivo = None
+        self.eventos = 0
+
+    @property
+    def duracion_ms(self):
+        return self.fin_ms - self.inicio_ms
+
+    @property
+    def tipo(self):
+        if self.balas <= 1:
+            return "tap"
+        if self.balas <= 5:
+            return "ráfaga"
+        return "spray"
+
+    def __repr__(self):
+        return (f"Segmento({self.tipo}, balas {self.bala_inicial + 1}-{self.bala_inicial + self.balas}, "
+                f"{self.duracion_ms:.0f} ms, {self.motivo})")
+
+
+class SegmentadorDisparos:
+    """
+    Divide la entrada en grupos de disparos a medida que llega, con trabajo
+    constante por evento. Un segmento empieza al presionar y termina al
+    soltar, al vaciarse el cargador o al superar por cadencia las balas del
+    patrón. Con el botón mantenido también se corta:
+
+    - con munición de GSI, cuando deja de bajar durante PAUSA_MS más una
+      cadencia (el arma dejó de disparar; solo si ya bajó alguna vez en el
+      segmento) o sube (recarga); el siguiente disparo abre un segmento nuevo;
+    - sin GSI, ante un hueco de PAUSA_MS entre eventos o cuando el
+      movimiento de los últimos VENTANA_QUIETO_MS (dos cubetas de media
+      ventana) cae por debajo de UMBRAL_QUIETO; al volver a moverse se abre un segmento
+      que sigue el patrón donde va el fuego automático.
+    """
+    def __init__(self, cadencia_ms, balas_patron, reset_ms=RESET_RECOIL_MS, pausa_ms=PAUSA_MS,
+                 ventana_ms=VENTANA_QUIETO_MS, umbral_quieto=UMBRAL_QUIETO):
+        self.cadencia_ms = cadencia_ms
+        self.balas_patron = balas_patron
+        self.reset_ms = reset_ms
+        self.pausa_ms = pausa_ms
+        self.ventana_ms = ventana_ms
+        self.umbral_quieto = umbral_quieto
+        self.actual = None
+        self.presionado = False
+        self._ultimo_fin = None
+        self._siguiente_bala = 0
+        self._municion_inicial = None
+        self._presion_ms = 0.0
+        self._t_ultimo = 0.0          # último evento
+        self._cubeta = 0              # índice de la media ventana en curso
+        self._mov_actual = 0.0        # counts en la media ventana en curso
+        self._mov_previo = 0.0        # counts en la media ventana anterior
+        self._municion_ultima = None
+        self._t_ultimo_disparo = 0.0  # último descenso de munición
+        self._disparos_segmento = 0   # descensos de munición vistos en el segmento en curso
+
+    def configurar(self, cadencia_ms, balas_patron):
+        """Cambia el arma; el siguiente disparo empieza un patrón nuevo."""
+        self.cadencia_ms = cadencia_ms
+        self.balas_patron = balas_patron
+        self._ultimo_fin = None
+        self._siguiente_bala = 0
+
+    @property
+    def activo(self):
+        return self.actual is not None
+
+    def presionar(self, t_ms, municion=None):
+        """Empieza un segmento. Continúa el patrón si el recoil no se recuperó."""
+        self.presionado = True
+        self._presion_ms = t_ms
+        self._t_ultimo = t_ms
+        self._cubeta = int(t_ms // (self.ventana_ms / 2))
+        self._mov_actual = self._mov_previo = 0.0
+        self._municion_ultima = municion
+        self._t_ultimo_disparo = t_ms
+        return self._abrir(t_ms, municion)
+
+    def _abrir(self, t_ms, municion):
+        if self._ultimo_fin is None or t_ms - self._ultimo_fin >= self.reset_ms:
+            self._siguiente_bala = 0
+        if self._siguiente_bala >= self.balas_patron:
+            self._siguiente_bala = self.balas_patron - 1
+        self.actual = Segmento(t_ms, self._siguiente_bala)
+        self._municion_inicial = municion
+        self._disparos_segmento = 0
+        return self.actual
+
+    def mover(self, t_ms, dx=0, dy=0, municion=None):
+        """
+        Registra un evento con el botón presionado. Devuelve (cerrado,
+        abierto): el segmento que este evento cerró y el que abrió (o None).
+        Un segmento cortado por un hueco termina en el evento anterior; el
+        resto incluye este evento.
+        """
+        if not self.presionado:
+            return None, None
+        dt = t_ms - self._t_ultimo
+        self._t_ultimo = t_ms
+        cubeta = int(t_ms // (self.ventana_ms / 2))
+        if cubeta != self._cubeta:
+            self._mov_previo = self._mov_actual if cubeta == self._cubeta + 1 else 0.0
+            self._mov_actual = 0.0
+            self._cubeta = cubeta
+        self._mov_actual += math.hypot(dx, dy)
+        movimiento = self._mov_previo + self._mov_actual
+        disparo = recarga = False
+        anterior = self._municion_ultima
+        if municion is not None:
+            if anterior is not None:
+                disparo = municion < anterior
+                recarga = municion > anterior
+            self._municion_ultima = municion
+            if disparo:
+                self._t_ultimo_disparo = t_ms
+                self._disparos_segmento += 1
+        con_gsi = municion is not None
+
+        cerrado = None
+        seg = self.actual
+        if seg is not None:
+            # Sin ningún descenso todavía no se sabe si GSI sigue al día: no se corta por pausa
+            sin_disparar = (self._disparos_segmento > 0
+                            and t_ms - self._t_ultimo_disparo > self.pausa_ms + self.cadencia_ms)
+            if con_gsi and (recarga or sin_disparar):
+                # El arma dejó de disparar: el segmento acaba en el último disparo
+                fin = max(self._t_ultimo_disparo, seg.inicio_ms)
+                cerrado = self._cortar(fin, anterior, "recarga" if recarga else "pausa")
+            elif not con_gsi and dt > self.pausa_ms:
+                cerrado = self._cortar(t_ms - dt, None, "pausa")
+            else:
+                seg.eventos += 1
+                seg.fin_ms = t_ms
+                seg.balas = int((t_ms - seg.inicio_ms) // self.cadencia_ms) + 1
+                if municion == 0 and self._municion_inicial:
+                    seg.balas = min(seg.balas, self._municion_inicial)
+                    return self._cerrar(t_ms, "cargador"), None
+                if seg.bala_inicial + seg.balas > self.balas_patron:
+                    seg.balas = self.balas_patron - seg.bala_inicial
+                    return self._cerrar(t_ms, "cargador"), None
+                if (not con_gsi and t_ms - seg.inicio_ms >= self.ventana_ms
+                        and movimiento < self.umbral_quieto):
+                    return self._cortar(t_ms, None, "quieto"), None
+                return None, None
+
+        # Sin segmento abierto: el siguiente disparo (o el ratón otra vez en
+        # movimiento, sin GSI) empieza uno
+        abierto = None
+        if con_gsi:
+            if disparo and municion > 0:
+                abierto = self._abrir(t_ms, anterior)  # la munición antes de este disparo
+                self._disparos_segmento = 1
+        elif movimiento >= self.umbral_quieto:
+            # El fuego automático siguió: la bala sale de la cadencia desde que se presionó
+            bala = int((t_ms - self._presion_ms) // self.cadencia_ms)
+            if bala < self.balas_patron:
+                abierto = Segmento(self._presion_ms + bala * self.cadencia_ms, bala)
+                abierto.eventos = 1
+                abierto.fin_ms = t_ms
+                self.actual = abierto
+                self._municion_inicial = None
+        return cerrado, abierto
+
+    def _cortar(self, fin_ms, municion, motivo):
+        """Cierra el segmento en fin_ms; con GSI las balas son la munición gastada hasta `municion`."""
+        seg = self.actual
+        seg.fin_ms = fin_ms
+        if municion is not None and self._municion_inicial:
+            disparadas = self._municion_inicial - municion
+            seg.balas = max(1, min(disparadas, self.balas_patron - seg.bala_inicial))
+        else:
+            seg.balas = max(1, min(int((fin_ms - seg.inicio_ms) // self.cadencia_ms) + 1,
+                                   self.balas_patron - seg.bala_inicial))
+        return self._cerrar(fin_ms, motivo)
+
+    def soltar(self, t_ms):
+        """Cierra el segmento en curso (si sigue abierto) y lo devuelve."""
+        self.presionado = False
+        seg = self.actual
+        if seg is None:
+            return None
+        seg.fin_ms = t_ms
+        seg.balas = max(1, min(int((t_ms - seg.inicio_ms) // self.cadencia_ms) + 1,
+                               self.balas_patron - seg.bala_inicial))
+        return self._cerrar(t_ms, "soltar")
+
+    def _cerrar(self, t_ms, motivo):
+        seg = self.actual
+        seg.motivo = motivo
+        self.actual = None
+        self._ultimo_fin = t_ms
+        self._siguiente_bala = seg.bala_inicial + seg.balas
+        return seg
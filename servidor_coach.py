@@ -0,0 +1,394 @@
+# servidor_coach.py
+
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import asyncio
+import argparse
+import threading
+import collections
+import concurrent.futures
+import numpy as np
+
+from codec_trazos import RegistroTrazo
+from patrones import cargar_patrones_arma, RECOIL_PATTERNS_DIR
+from puntuacion import errores_por_bala
+from sprays import Spray
+from metricas import REGISTRO
+
+COACH_PORT = 54330
+TRAMA = struct.Struct("<I")       # cada mensaje: largo (uint32) + contenido
+MAX_TRAMA = 4 * 1024 * 1024
+EN_VUELO_POR_JUGADOR = 8          # sprays sin responder por conexión antes de dejar de leer
+COLA_MAX = 1024                   # sprays esperando un worker (tope global)
+LOTE_MAX = 64                     # sprays por tarea enviada al pool
+LOTE_ESPERA_MS = 2                # espera máxima para completar un lote
+INTERVALO_TABLERO_S = 2.0
+ULTIMOS_TABLERO = 20              # sprays recientes que cuentan para el promedio
+
+m_recibidos = REGISTRO.contador("coach_sprays_received_total", "Sprays recibidos por el servidor del coach")
+m_invalidos = REGISTRO.contador("coach_sprays_invalid_total", "Sprays que no se pudieron puntuar")
+m_latencia = REGISTRO.histograma(
+    "coach_latency_seconds", "Tiempo desde que llega un spray hasta que se puntúa",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0))
+m_lote = REGISTRO.histograma("coach_batch_size", "Sprays por tarea del pool",
+                             buckets=(1, 2, 4, 8, 16, 32, 64))
+m_cola = REGISTRO.medidor("coach_queue_depth", "Sprays esperando un worker")
+m_jugadores = REGISTRO.medidor("coach_players_connected", "Conexiones de jugadores abiertas")
+
+
+def trama(datos):
+    return TRAMA.pack(len(datos)) + datos
+
+
+async def leer_trama(reader):
+    """Lee un mensaje completo; None si la conexión se cerró."""
+    try:
+        cabecera = await reader.readexactly(TRAMA.size)
+        (largo,) = TRAMA.unpack(cabecera)
+        if largo > MAX_TRAMA:
+            raise ValueError(f"trama de {largo} bytes")
+        return await reader.readexactly(largo)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+# --- Workers (un proceso por núcleo, cada uno con la biblioteca de patrones) ---
+
+_patrones = {}
+
+
+def _iniciar_worker(directorio):
+    global _patrones
+    _patrones = cargar_patrones_arma(directorio)
+
+
+def puntuar_lote(tramas):
+    """Decodifica y puntúa un lote de registros. Corre dentro del pool."""
+    resultados = []
+    for datos in tramas:
+        try:
+            spray = Spray.desde_registro(RegistroTrazo.desde_bytes(datos))
+        except (struct.error, ValueError, UnicodeDecodeError) as e:
+            resultados.append({"error": f"registro inválido: {e}"})
+            continue
+        resultado = {"weapon": spray.weapon, "timestamp": spray.timestamp, "eventos": len(spray.deltas)}
+        patron = _patrones.get(spray.weapon)
+        if patron is None:
+            resultado["error"] = "arma sin patrón"
+        else:
+            errores = errores_por_bala(spray.posiciones(), spray.tiempos_ms, patron)
+            resultado["balas"] = len(errores)
+            resultado["error_medio"] = float(errores.mean()) if len(errores) else None
+            resultado["error_max"] = float(errores.max()) if len(errores) else None
+        resultados.append(resultado)
+    return resultados
+
+
+# --- Servidor ---
+
+class Jugador:
+    """Estadísticas acumuladas de un jugador (por nombre, entre reconexiones)."""
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.sprays = 0
+        self.recientes = collections.deque(maxlen=ULTIMOS_TABLERO)
+        self.mejor = None
+
+    def registrar(self, resultado):
+        error = resultado.get("error_medio")
+        if error is None:
+            return
+        self.sprays += 1
+        self.recientes.append(error)
+        if self.mejor is None or error < self.mejor:
+            self.mejor = error
+
+    @property
+    def promedio(self):
+        return sum(self.recientes) / len(self.recientes) if self.recientes else float("inf")
+
+
+class ServidorCoach:
+    """
+    Recibe los sprays de varios trainers y los puntúa en un pool de
+    procesos. Los sprays se agrupan en lotes para amortizar el costo de
+    enviar trabajo al pool. La contrapresión es de punta a punta: cada
+    conexión admite EN_VUELO_POR_JUGADOR sprays sin responder y la cola
+    global es acotada; al llenarse se deja de leer del socket y TCP frena
+    al cliente.
+    """
+    def __init__(self, directorio=RECOIL_PATTERNS_DIR, workers=None, host="0.0.0.0", port=COACH_PORT):
+        self.directorio = directorio
+        self.workers = workers or os.cpu_count() or 1
+        self.host = host
+        self.port = port
+        self.jugadores = {}
+        self.conexiones = 0
+        self.puntuados = 0
+        self.pool = None
+        self.cola = None
+
+    async def servir(self):
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_iniciar_worker, initargs=(self.directorio,))
+        self.cola = asyncio.Queue(COLA_MAX)
+        tareas = [asyncio.create_task(self._despachar()) for _ in range(self.workers)]
+        tareas.append(asyncio.create_task(self._tablero()))
+        server = await asyncio.start_server(self._atender, self.host, self.port)
+        print(f"Servidor del coach escuchando en {self.host}:{self.port} ({self.workers} workers)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+    async def _atender(self, reader, writer):
+        try:
+            hola = await leer_trama(reader)
+            nombre = json.loads(hola)["jugador"] if hola else None
+        except (ValueError, KeyError, TypeError):
+            nombre = None
+        if not isinstance(nombre, str) or not nombre:
+            writer.close()
+            return
+        jugador = self.jugadores.setdefault(nombre, Jugador(nombre))
+        self.conexiones += 1
+        m_jugadores.set(self.conexiones)
+        print(f"🎮 Conectado: {nombre}")
+
+        en_vuelo = asyncio.Semaphore(EN_VUELO_POR_JUGADOR)
+        pendientes = asyncio.Queue()
+        respuestas = asyncio.create_task(self._responder(jugador, writer, pendientes, en_vuelo))
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Si _responder termina (p.ej. el cliente cortó durante drain) no
+                # va a liberar más permisos: no quedarse esperando uno
+                permiso = asyncio.ensure_future(en_vuelo.acquire())
+                await asyncio.wait((permiso, respuestas), return_when=asyncio.FIRST_COMPLETED)
+                if not permiso.done():
+                    permiso.cancel()
+                    break
+                datos = await leer_trama(reader)
+                if datos is None:
+                    break
+                m_recibidos.inc()
+                futuro = loop.create_future()
+                await self.cola.put((datos, time.perf_counter(), futuro))
+                pendientes.put_nowait(futuro)
+        except (ConnectionError, ValueError) as e:
+            print(f"  ❌ {nombre}: {e}")
+        finally:
+            pendientes.put_nowait(None)
+            try:
+                await respuestas
+            except ConnectionError:
+                pass
+            writer.close()
+            self.conexiones -= 1
+            m_jugadores.set(self.conexiones)
+            print(f"👋 Desconectado: {nombre}")
+
+    async def _responder(self, jugador, writer, pendientes, en_vuelo):
+        """Devuelve los resultados en el orden en que llegaron los sprays."""
+        while True:
+            futuro = await pendientes.get()
+            if futuro is None:
+                return
+            resultado = await futuro
+            jugador.registrar(resultado)
+            writer.write(trama(json.dumps(resultado).encode("utf-8")))
+            await writer.drain()
+            en_vuelo.release()
+
+    async def _despachar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self.cola.get()]
+            for espera in (False, True):
+                while len(lote) < LOTE_MAX and not self.cola.empty():
+                    lote.append(self.cola.get_nowait())
+                if len(lote) >= LOTE_MAX or espera:
+                    break
+                await asyncio.sleep(LOTE_ESPERA_MS / 1000)
+            m_cola.set(self.cola.qsize())
+            m_lote.observe(len(lote))
+            try:
+                resultados = await loop.run_in_executor(self.pool, puntuar_lote, [datos for datos, _, _ in lote])
+            except Exception as e:
+                resultados = [{"error": f"worker: {e}"}] * len(lote)
+            ahora = time.perf_counter()
+            for (_, inicio, futuro), resultado in zip(lote, resultados):
+                resultado = dict(resultado, latencia_ms=(ahora - inicio) * 1000)
+                if "error" in resultado:
+                    m_invalidos.inc()
+                m_latencia.observe(ahora - inicio)
+                if not futuro.done():
+                    futuro.set_result(resultado)
+            self.puntuados += len(lote)
+
+    async def _tablero(self):
+        """Comparación en vivo: ranking por error medio de los últimos sprays."""
+        anterior = 0
+        while True:
+            await asyncio.sleep(INTERVALO_TABLERO_S)
+            if self.puntuados == anterior:
+                continue
+            ritmo = (self.puntuados - anterior) / INTERVALO_TABLERO_S
+            anterior = self.puntuados
+            ranking = sorted((j for j in self.jugadores.values() if j.recientes), key=lambda j: j.promedio)
+            print(f"\n🏆 {len(ranking)} jugadores, {ritmo:.0f} sprays/s, cola {self.cola.qsize()}")
+            for i, j in enumerate(ranking[:10], 1):
+                print(f"  {i:2d}. {j.nombre:16s} error medio {j.promedio:5.1f} px  "
+                      f"mejor {j.mejor:5.1f} px  ({j.sprays} sprays)")
+
+
+# --- Cliente del trainer ---
+
+class ClienteCoach:
+    """
+    Envía los sprays del trainer al servidor del coach desde hilos propios,
+    sin bloquear el bucle de entrada: si la cola está llena o no hay
+    conexión, el spray se descarta.
+    """
+    def __init__(self, host, port=COACH_PORT, jugador="jugador", max_cola=64):
+        self.host = host
+        self.port = port
+        self.jugador = jugador
+        self.cola = queue.Queue(max_cola)
+        self.descartados = 0
+
+    def iniciar(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def enviar(self, spray):
+        try:
+            self.cola.put_nowait(spray.a_registro().a_bytes())
+        except queue.Full:
+            self.descartados += 1
+
+    def _run(self):
+        while True:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=5) as sock:
+                    sock.settimeout(None)
+                    sock.sendall(trama(json.dumps({"jugador": self.jugador}).encode("utf-8")))
+                    print(f"📡 Conectado al coach en {self.host}:{self.port}")
+                    threading.Thread(target=self._recibir, args=(sock,), daemon=True).start()
+                    while True:
+                        sock.sendall(trama(self.cola.get()))
+            except OSError as e:
+                print(f"⚠️  Coach no disponible ({e}); reintentando en 5 s")
+                time.sleep(5)
+
+    def _recibir(self, sock):
+        """Consume las respuestas (si no, el servidor deja de leer)."""
+        archivo = sock.makefile("rb")
+        while True:
+            cabecera = archivo.read(TRAMA.size)
+            if len(cabecera) < TRAMA.size:
+                return
+            resultado = json.loads(archivo.read(TRAMA.unpack(cabecera)[0]))
+            if "error" in resultado:
+                print(f"⚠️  Coach: {resultado['error']}")
+
+
+# --- Jugadores simulados ---
+
+def sprays_simulados(patrones, cantidad, rng, sensibilidad=0.35, hz=1000):
+    """Registros sintéticos: el patrón seguido con ruido acumulado, a `hz` eventos por segundo."""
+    registros = []
+    nombres = sorted(patrones)
+    for i in range(cantidad):
+        patron = patrones[nombres[i % len(nombres)]]
+        tiempos = np.arange(1, int(patron.duracion_ms), 1000 / hz)
+        ideal = patron.tabla[tiempos.astype(np.int64)]
+        ruido = np.cumsum(rng.normal(scale=rng.uniform(0.05, 0.6), size=ideal.shape), axis=0)
+        cuentas = np.round((ideal + ruido) / sensibilidad).astype(np.int64)
+        deltas = np.diff(cuentas, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+        spray = Spray(patron.nombre, tiempos, deltas, sensibilidad, timestamp=time.time())
+        registros.append(spray.a_registro().a_bytes())
+    return registros
+
+
+async def _simular_jugador(host, port, nombre, registros, sprays, intervalo_s, latencias, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(trama(json.dumps({"jugador": nombre}).encode("utf-8")))
+    enviados = collections.deque()
+
+    async def recibir():
+        for _ in range(sprays):
+            datos = await leer_trama(reader)
+            if datos is None:
+                return
+            latencias.append(time.perf_counter() - enviados.popleft())
+
+    receptor = asyncio.create_task(recibir())
+    await asyncio.sleep(rng.uniform(0, intervalo_s))  # no arrancar todos a la vez
+    for _ in range(sprays):
+        enviados.append(time.perf_counter())
+        writer.write(trama(registros[rng.integers(len(registros))]))
+        await writer.drain()
+        await asyncio.sleep(intervalo_s)
+    await receptor
+    writer.close()
+
+
+async def simular(host, port, jugadores, sprays, intervalo_s, directorio=RECOIL_PATTERNS_DIR):
+    patrones = cargar_patrones_arma(directorio)
+    if not patrones:
+        print(f"⚠️  No hay patrones en '{directorio}' para simular sprays")
+        return
+    rng = np.random.default_rng()
+    registros = sprays_simulados(patrones, 64, rng)
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        _simular_jugador(host, port, f"bot{i:03d}", registros, sprays, intervalo_s, latencias,
+                         np.random.default_rng(i))
+        for i in range(jugadores)))
+    total = time.perf_counter() - inicio
+    if not latencias:
+        print("⚠️  Sin respuestas del servidor")
+        return
+    ms = np.sort(np.asarray(latencias)) * 1000
+    print(f"[OK] {len(ms)} sprays de {jugadores} jugadores en {total:.1f} s ({len(ms) / total:.0f} sprays/s)")
+    print(f"     latencia p50 {np.percentile(ms, 50):.1f} ms, p95 {np.percentile(ms, 95):.1f} ms, "
+          f"p99 {np.percentile(ms, 99):.1f} ms, máx {ms[-1]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local del coach: puntúa sprays de varios trainers")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    srv = sub.add_parser("servidor")
+    srv.add_argument("--host", default="0.0.0.0")
+    srv.add_argument("--puerto", type=int, default=COACH_PORT)
+    srv.add_argument("--workers", type=int, default=None)
+    srv.add_argument("--patrones", default=RECOIL_PATTERNS_DIR)
+    sim = sub.add_parser("simular", help="cliente que simula muchos jugadores")
+    sim.add_argument("--host", default="127.0.0.1")
+    sim.add_argument("--puerto", type=int, default=COACH_PORT)
+    sim.add_argument("--jugadores", type=int, default=50)
+    sim.add_argument("--sprays", type=int, default=40, help="sprays por jugador")
+    sim.add_argument("--intervalo", type=float, default=0.1, help="segundos entre sprays de un jugador")
+    sim.add_argument("--patrones", default=RECOIL_PATTERNS_DIR)
+    args = parser.parse_args()
+
+    try:
+        if args.comando == "servidor":
+            asyncio.run(ServidorCoach(args.patrones, args.workers, args.host, args.puerto).servir())
+        else:
+            asyncio.run(simular(args.host, args.puerto, args.jugadores, args.sprays, args.intervalo, args.patrones))
+    except KeyboardInterrupt:
+        print("Saliendo...")
+
+
+if __name__ == "__main__":
+    main()
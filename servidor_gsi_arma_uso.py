@@ -4,19 +4,29 @@ import http.server
 import socketserver
 import json
 import threading
+import time
 from functools import partial
 from PyQt5.QtCore import QObject, pyqtSignal
+from metricas import REGISTRO
+
+gsi_payloads = REGISTRO.contador("gsi_payloads_total", "Payloads GSI recibidos")
+gsi_payloads_invalidos = REGISTRO.contador("gsi_payloads_invalid_total", "Payloads GSI con JSON inválido")
+gsi_cambios_arma = REGISTRO.contador("gsi_weapon_changes_total", "Cambios de arma notificados por GSI")
 
 class GsiHandler(http.server.BaseHTTPRequestHandler):
 
     current_weapon = None
     callback = None
+    last_update = None  # time.time() del último payload válido
+    current_ammo = None  # balas en el cargador del arma activa (ammo_clip)
 
     def do_POST(self):
         content_length = int(self.headers.get('Content-Length', 0))
         post_data = self.rfile.read(content_length)
+        gsi_payloads.inc()
         try:
             data = json.loads(post_data)
+            GsiHandler.last_update = time.time()
             active_weapon_name = None
             
             # Navega por el JSON para encontrar el arma activa
@@ -24,16 +34,18 @@ class GsiHandler(http.server.BaseHTTPRequestHandler):
                 for weapon in data["player"].get("weapons", {}).values():
                     if weapon.get("state") == "active":
                         active_weapon_name = weapon.get("name")
+                        GsiHandler.current_ammo = weapon.get("ammo_clip")
                         break
             
             # Si el arma cambió, notifica a la instancia principal del servidor
             if active_weapon_name and active_weapon_name != GsiHandler.current_weapon:
                 GsiHandler.callback(active_weapon_name)
                 GsiHandler.current_weapon = active_weapon_name
+                gsi_cambios_arma.inc()
 
         except (json.JSONDecodeError, KeyError):
             # Ignora errores si el JSON es inválido o no tiene la estructura esperada
-            pass
+            gsi_payloads_invalidos.inc()
 
         self.send_response(200)
         self.end_headers()
@@ -44,4 +56,22 @@ class GsiHandler(http.server.BaseHTTPRequestHandler):
         pass
 
 
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Expone el registro de métricas en /metrics (formato Prometheus)."""
+
+    registro = REGISTRO
 
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.registro.exportar().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,268 @@
+# simplificador.py
+
+import math
+import numpy as np
+
+TOLERANCIA_PX = 0.5      # distancia objetivo de un punto descartado a la polilínea reducida
+MAX_PENDIENTES = 256     # lookahead acotado: como mucho tantos puntos sin fijar un vértice
+
+
+def _envolver(angulo):
+    """Lleva un ángulo a [-pi, pi)."""
+    return (angulo + math.pi) % (2 * math.pi) - math.pi
+
+
+class SimplificadorTrazo:
+    """
+    Simplificación en línea de una polilínea con trabajo O(1) por punto
+    (ajuste de "manga" angular, Zhao–Saalfeld). Desde el último vértice
+    fijado se mantiene el cono de direcciones que pasan a menos de
+    `tolerancia` de todos los puntos pendientes; cuando un punto nuevo queda
+    fuera del cono, el punto anterior se fija como vértice.
+
+    Para que un trazo que retrocede no quede cubierto por el segmento,
+    además se exige que el punto nuevo no quede más cerca del vértice que el
+    punto pendiente más lejano (salvo a menos de `tolerancia` de él). Con
+    puntos que oscilan alrededor del vértice la cota es aproximada (hasta
+    ~1.3 veces la tolerancia); error_maximo() da el valor exacto.
+
+    Los vértices fijados ya no cambian, así que se pueden dibujar o guardar
+    en cuanto aparecen; el tramo desde el último vértice hasta el punto
+    actual es la "cola" provisoria.
+    """
+    def __init__(self, tolerancia=TOLERANCIA_PX, max_pendientes=MAX_PENDIENTES):
+        self.tolerancia = tolerancia
+        self.max_pendientes = max_pendientes
+        self.reset()
+
+    def reset(self, x=None, y=None):
+        """Empieza un trazo nuevo (opcionalmente con su primer punto)."""
+        self.indices = []        # índice (en la entrada) de cada vértice fijado
+        self.vertices = []       # (x, y) de cada vértice fijado
+        self.n = 0
+        self.ultimo = None
+        self._cono = None        # (centro, semiancho) en radianes; None = sin restricción
+        self._lejano = None      # (distancia², x, y) del pendiente más alejado del vértice
+        self._pendientes = 0
+        if x is not None:
+            self.agregar(x, y)
+
+    def agregar(self, x, y):
+        """
+        Agrega un punto. Devuelve el vértice (x, y) fijado por este punto, o
+        None si el punto quedó pendiente.
+        """
+        i = self.n
+        self.n += 1
+        if not self.vertices:
+            self._fijar(i, x, y)
+            self.ultimo = (i, x, y)
+            return (x, y)
+
+        fijado = None
+        if not self._admite(x, y) or self._pendientes >= self.max_pendientes:
+            j, lx, ly = self.ultimo
+            self._fijar(j, lx, ly)
+            fijado = (lx, ly)
+        self._estrechar(x, y)
+        self._pendientes += 1
+        self.ultimo = (i, x, y)
+        return fijado
+
+    def finalizar(self):
+        """Fija el último punto como vértice (fin del trazo). Devuelve el vértice o None."""
+        if self.ultimo is None or self.indices[-1] == self.ultimo[0]:
+            return None
+        j, lx, ly = self.ultimo
+        self._fijar(j, lx, ly)
+        return (lx, ly)
+
+    @property
+    def cola(self):
+        """Tramo provisorio ((x0, y0), (x1, y1)) desde el último vértice, o None."""
+        if self.ultimo is None or self.indices[-1] == self.ultimo[0]:
+            return None
+        return self.vertices[-1], self.ultimo[1:]
+
+    def _fijar(self, i, x, y):
+        self.indices.append(i)
+        self.vertices.append((x, y))
+        self._cono = None
+        self._lejano = None
+        self._pendientes = 0
+
+    def _admite(self, x, y):
+        if self._lejano is None:
+            return True
+        ax, ay = self.vertices[-1]
+        dx, dy = x - ax, y - ay
+        tol2 = self.tolerancia * self.tolerancia
+        d2 = dx * dx + dy * dy
+        d2_lejano, fx, fy = self._lejano
+        if d2 < d2_lejano and (x - fx) ** 2 + (y - fy) ** 2 > tol2:
+            return False
+        if d2 <= tol2:
+            return True
+        if self._cono is None:
+            return True
+        centro, semiancho = self._cono
+        return abs(_envolver(math.atan2(dy, dx) - centro)) <= semiancho
+
+    def _estrechar(self, x, y):
+        ax, ay = self.vertices[-1]
+        dx, dy = x - ax, y - ay
+        d2 = dx * dx + dy * dy
+        if self._lejano is None or d2 > self._lejano[0]:
+            self._lejano = (d2, x, y)
+        d = math.sqrt(d2)
+        if d <= self.tolerancia:
+            return  # cerca del vértice: cualquier dirección le sirve
+        theta = math.atan2(dy, dx)
+        mitad = math.asin(self.tolerancia / d)
+        if self._cono is None:
+            self._cono = (theta, mitad)
+            return
+        centro, semiancho = self._cono
+        t = centro + _envolver(theta - centro)
+        lo = max(centro - semiancho, t - mitad)
+        hi = min(centro + semiancho, t + mitad)
+        self._cono = ((lo + hi) / 2, max(0.0, (hi - lo) / 2))
+
+
+class SimplificadorTemporal:
+    """
+    Variante para guardar trazos: acota la distancia sincrónica (SED), es
+    decir, la distancia entre cada punto original y la posición que da la
+    polilínea reducida interpolada linealmente en el tiempo en ese mismo
+    instante. Así el error por bala calculado sobre los vértices guardados
+    difiere a lo sumo en `tolerancia` del calculado con todos los eventos.
+
+    Desde el último vértice (t0, a), un segmento hasta el punto actual es
+    válido si su velocidad v cumple |v - (p_i - a)/(t_i - t0)| <= tol/(t_i - t0)
+    para cada pendiente: un disco por punto en el espacio de velocidades. Se
+    intersecan los cuadrados inscritos en esos discos (conservador, O(1) por
+    punto).
+    """
+    def __init__(self, tolerancia=TOLERANCIA_PX, max_pendientes=MAX_PENDIENTES):
+        self.tolerancia = tolerancia
+        self.max_pendientes = max_pendientes
+        self.reset()
+
+    def reset(self, t=None, x=None, y=None):
+        """Empieza un trazo nuevo (opcionalmente con su primer punto)."""
+        self.indices = []        # índice (en la entrada) de cada vértice fijado
+        self.vertices = []       # (t, x, y) de cada vértice fijado
+        self.n = 0
+        self.ultimo = None
+        self._caja = None        # (vx_min, vx_max, vy_min, vy_max); None = sin restricción
+        self._pendientes = 0
+        if t is not None:
+            self.agregar(t, x, y)
+
+    def agregar(self, t, x, y):
+        """Agrega un punto. Devuelve el vértice (t, x, y) fijado por este punto, o None."""
+        i = self.n
+        self.n += 1
+        if not self.vertices:
+            self._fijar(i, t, x, y)
+            self.ultimo = (i, t, x, y)
+            return (t, x, y)
+
+        fijado = None
+        if not self._admite(t, x, y) or self._pendientes >= self.max_pendientes:
+            j, lt, lx, ly = self.ultimo
+            self._fijar(j, lt, lx, ly)
+            fijado = (lt, lx, ly)
+        self._estrechar(t, x, y)
+        self._pendientes += 1
+        self.ultimo = (i, t, x, y)
+        return fijado
+
+    def finalizar(self):
+        """Fija el último punto como vértice (fin del trazo). Devuelve el vértice o None."""
+        if self.ultimo is None or self.indices[-1] == self.ultimo[0]:
+            return None
+        j, lt, lx, ly = self.ultimo
+        self._fijar(j, lt, lx, ly)
+        return (lt, lx, ly)
+
+    def _fijar(self, i, t, x, y):
+        self.indices.append(i)
+        self.vertices.append((t, x, y))
+        self._caja = None
+        self._pendientes = 0
+
+    def _admite(self, t, x, y):
+        t0, ax, ay = self.vertices[-1]
+        dt = t - t0
+        if dt <= 0:
+            # Mismo instante que el vértice: tiene que coincidir con él
+            return (x - ax) ** 2 + (y - ay) ** 2 <= self.tolerancia * self.tolerancia
+        if self._caja is None:
+            return True
+        vx, vy = (x - ax) / dt, (y - ay) / dt
+        x0, x1, y0, y1 = self._caja
+        return x0 <= vx <= x1 and y0 <= vy <= y1
+
+    def _estrechar(self, t, x, y):
+        t0, ax, ay = self.vertices[-1]
+        dt = t - t0
+        if dt <= 0:
+            return
+        vx, vy = (x - ax) / dt, (y - ay) / dt
+        r = self.tolerancia / (dt * math.sqrt(2))
+        if self._caja is None:
+            self._caja = (vx - r, vx + r, vy - r, vy + r)
+            return
+        x0, x1, y0, y1 = self._caja
+        self._caja = (max(x0, vx - r), min(x1, vx + r), max(y0, vy - r), min(y1, vy + r))
+
+
+def simplificar(puntos, tolerancia=TOLERANCIA_PX, max_pendientes=MAX_PENDIENTES):
+    """Índices de los vértices de una polilínea (N, 2) completa (mismo algoritmo que en línea)."""
+    simplificador = SimplificadorTrazo(tolerancia, max_pendientes)
+    for x, y in np.asarray(puntos, dtype=np.float64).tolist():
+        simplificador.agregar(x, y)
+    simplificador.finalizar()
+    return np.asarray(simplificador.indices, dtype=np.int64)
+
+
+def error_maximo(puntos, indices):
+    """
+    Distancia máxima (px) de los puntos originales a la polilínea reducida,
+    calculada de una vez: cada punto se mide contra el segmento que lo cubre.
+    """
+    puntos = np.asarray(puntos, dtype=np.float64)
+    indices = np.asarray(indices)
+    if len(puntos) < 3 or len(indices) < 2:
+        return 0.0
+    seg = np.clip(np.searchsorted(indices, np.arange(len(puntos)), side="right") - 1, 0, len(indices) - 2)
+    a = puntos[indices[seg]]
+    b = puntos[indices[seg + 1]]
+    ab = b - a
+    largo2 = np.einsum("ij,ij->i", ab, ab)
+    t = np.clip(np.einsum("ij,ij->i", puntos - a, ab) / np.where(largo2 > 0, largo2, 1), 0, 1)
+    cerca = a + t[:, None] * ab
+    return float(np.hypot(*(puntos - cerca).T).max())
+
+
+def simplificar_temporal(tiempos, puntos, tolerancia=TOLERANCIA_PX, max_pendientes=MAX_PENDIENTES):
+    """Índices de los vértices con SimplificadorTemporal sobre un trazo completo."""
+    simplificador = SimplificadorTemporal(tolerancia, max_pendientes)
+    for t, (x, y) in zip(np.asarray(tiempos, dtype=np.float64).tolist(),
+                         np.asarray(puntos, dtype=np.float64).tolist()):
+        simplificador.agregar(t, x, y)
+    simplificador.finalizar()
+    return np.asarray(simplificador.indices, dtype=np.int64)
+
+
+def error_sincronico(tiempos, puntos, indices):
+    """Distancia máxima (px) entre cada punto y la polilínea reducida interpolada en su instante."""
+    tiempos = np.asarray(tiempos, dtype=np.float64)
+    puntos = np.asarray(puntos, dtype=np.float64)
+    indices = np.asarray(indices)
+    if len(puntos) < 3 or len(indices) < 2:
+        return 0.0
+    x = np.interp(tiempos, tiempos[indices], puntos[indices, 0])
+    y = np.interp(tiempos, tiempos[indices], puntos[indices, 1])
+    return float(np.hypot(x - puntos[:, 0], y - puntos[:, 1]).max())
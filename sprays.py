@@ -0,0 +1,81 @@
+# sprays.py
+
+import os
+import time
+import numpy as np
+from codec_trazos import RegistroTrazo, agregar_registros, leer_registros
+
+SPRAYS_DIR = "sprays"
+
+
+class Spray:
+    """
+    Un spray grabado: deltas crudos del ratón (ya orientados como en el
+    canvas), su tiempo desde el inicio del clic y la sensibilidad del overlay.
+    """
+    def __init__(self, weapon, tiempos_ms, deltas, sensibilidad, timestamp=None):
+        self.weapon = weapon
+        self.tiempos_ms = np.asarray(tiempos_ms, dtype=np.float32)
+        self.deltas = np.asarray(deltas, dtype=np.int32).reshape(-1, 2)
+        self.sensibilidad = float(sensibilidad)
+        self.timestamp = time.time() if timestamp is None else float(timestamp)
+
+    def posiciones(self):
+        """Posiciones acumuladas en píxeles relativas al primer disparo, (N+1, 2)."""
+        pos = np.zeros((len(self.deltas) + 1, 2), dtype=np.float32)
+        np.cumsum(self.deltas, axis=0, out=pos[1:])
+        pos *= self.sensibilidad
+        return pos
+
+    def simplificado(self, indices):
+        """
+        Spray reducido a los vértices indicados (índices de posiciones(), ver
+        simplificador.py). Las posiciones en los vértices son exactas: cada
+        delta guardado es la suma de los deltas crudos del tramo.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = indices[indices > 0] - 1
+        acumulado = np.cumsum(self.deltas, axis=0)[indices]
+        deltas = np.diff(acumulado, axis=0, prepend=np.zeros((1, 2), dtype=acumulado.dtype))
+        return Spray(self.weapon, self.tiempos_ms[indices], deltas, self.sensibilidad, self.timestamp)
+
+    def a_registro(self):
+        return RegistroTrazo.codificar(self.weapon, self.timestamp, self.sensibilidad,
+                                       self.deltas, self.tiempos_ms)
+
+    @classmethod
+    def desde_registro(cls, registro):
+        deltas, tiempos_ms = registro.decodificar()
+        return cls(registro.weapon, tiempos_ms, deltas, registro.sensibilidad, registro.timestamp)
+
+
+def guardar_spray(spray, directorio=SPRAYS_DIR):
+    """
+    Agrega el spray al archivo de trazos del día (sprays/AAAA-MM-DD.trz) en
+    el formato compacto de codec_trazos.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    nombre = time.strftime("%Y-%m-%d", time.localtime(spray.timestamp)) + ".trz"
+    path = os.path.join(directorio, nombre)
+    agregar_registros(path, [spray.a_registro()])
+    return path
+
+
+def cargar_sprays(directorio=SPRAYS_DIR):
+    """
+    Carga (en orden cronológico) todos los sprays guardados en el directorio.
+    También lee los .npz sueltos de versiones anteriores.
+    """
+    if not os.path.exists(directorio):
+        return []
+    sprays = []
+    for filename in sorted(os.listdir(directorio)):
+        path = os.path.join(directorio, filename)
+        if filename.endswith(".trz"):
+            sprays.extend(Spray.desde_registro(r) for r in leer_registros(path))
+        elif filename.endswith(".npz"):
+            with np.load(path) as data:
+                sprays.append(Spray(str(data["weapon"]), data["tiempos_ms"], data["deltas"],
+                                    float(data["sensibilidad"]), float(data["timestamp"])))
+    sprays.sort(key=lambda spray: spray.timestamp)
+    return sprays
@@ -0,0 +1,53 @@
+# test_segmentador.py
+
+from segmentador import SegmentadorDisparos
+
+CADENCIA_MS = 100
+BALAS_AK = 30
+
+
+def _spray(segmentador, municion, duracion_ms=2900, paso_ms=8):
+    """Simula un spray con movimiento continuo; devuelve los (cerrado, abierto) no vacíos."""
+    cambios = []
+    for t in range(paso_ms, duracion_ms, paso_ms):
+        cerrado, abierto = segmentador.mover(t, 0, 3, municion(t))
+        if cerrado is not None or abierto is not None:
+            cambios.append((t, cerrado, abierto))
+    return cambios
+
+
+def test_sin_gsi_un_spray_es_un_solo_segmento():
+    s = SegmentadorDisparos(CADENCIA_MS, BALAS_AK)
+    s.presionar(0, None)
+    assert _spray(s, lambda t: None) == []
+    seg = s.soltar(2900)
+    assert (seg.bala_inicial, seg.balas, seg.motivo) == (0, BALAS_AK, "soltar")
+
+
+def test_municion_fija_no_corta_por_pausa():
+    # GSI con un valor viejo que nunca baja: no hay que cortar el spray
+    s = SegmentadorDisparos(CADENCIA_MS, BALAS_AK)
+    s.presionar(0, 30)
+    assert _spray(s, lambda t: 30) == []
+    assert s.soltar(2900).balas == BALAS_AK
+
+
+def test_corta_cuando_la_municion_deja_de_bajar():
+    s = SegmentadorDisparos(CADENCIA_MS, BALAS_AK)
+    s.presionar(0, 30)
+    # Cinco disparos (a los 0, 100, ... 400 ms) y después el arma deja de disparar
+    cambios = _spray(s, lambda t: 30 - min(5, t // CADENCIA_MS + 1), duracion_ms=1000)
+    assert len(cambios) == 1
+    t, cerrado, abierto = cambios[0]
+    assert abierto is None
+    assert (cerrado.balas, cerrado.motivo) == (5, "pausa")
+    assert t > 400 + s.pausa_ms + CADENCIA_MS
+
+
+def test_pausa_sin_gsi_continua_el_patron():
+    s = SegmentadorDisparos(CADENCIA_MS, BALAS_AK)
+    s.presionar(0, None)
+    assert s.mover(100, 0, 5) == (None, None)
+    cerrado, abierto = s.mover(900, 0, 5)
+    assert (cerrado.fin_ms, cerrado.motivo) == (100, "pausa")
+    assert abierto.bala_inicial == 9
@@ -0,0 +1,236 @@
+# versiones_patrones.py
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import collections
+import numpy as np
+
+from codec_trazos import leer_registros, puntos_de_registro, codificar_puntos, agregar_registros
+from patrones import PatronArma, ruta_trz_vigente, CADENCIA_MS, CADENCIA_POR_DEFECTO_MS, RECOIL_PATTERNS_DIR
+from puntuacion import errores_por_bala
+
+# Estructura:
+#   recoil_json/versiones/objetos/<hash>.trz|.png   contenido, compartido entre versiones
+#   recoil_json/versiones/<version>.json             manifiesto: arma -> hashes + cadencia
+VERSIONES_DIR = os.path.join(RECOIL_PATTERNS_DIR, "versiones")
+MAX_PATRONES_EN_MEMORIA = 64
+
+
+def _hash(datos):
+    return hashlib.sha256(datos).hexdigest()[:20]
+
+
+def _guardar_objeto(datos, extension, objetos_dir):
+    """Guarda un blob por contenido; si ya existe (arma sin cambios) no se duplica."""
+    h = _hash(datos)
+    path = os.path.join(objetos_dir, f"{h}.{extension}")
+    if not os.path.exists(path):
+        with open(path + ".tmp", "wb") as f:
+            f.write(datos)
+        os.replace(path + ".tmp", path)
+    return h
+
+
+def _puntos_serializados(weapon_name, directorio):
+    """Bytes .trz de los puntos del arma (convierte desde el JSON si el .trz falta o es viejo)."""
+    path_trz = ruta_trz_vigente(weapon_name, directorio)
+    if path_trz is not None:
+        with open(path_trz, "rb") as f:
+            return f.read()
+    with open(os.path.join(directorio, f"{weapon_name}.json"), "r") as f:
+        puntos = json.load(f)
+    cadencia = CADENCIA_MS.get(weapon_name, CADENCIA_POR_DEFECTO_MS)
+    tmp = os.path.join(directorio, f".{weapon_name}.trz.tmp")
+    agregar_registros(tmp, [codificar_puntos(weapon_name, puntos, cadencia)])
+    with open(tmp, "rb") as f:
+        datos = f.read()
+    os.remove(tmp)
+    return datos
+
+
+def registrar_version(version, desde=None, directorio=RECOIL_PATTERNS_DIR, versiones_dir=VERSIONES_DIR):
+    """
+    Toma una instantánea del set de patrones actual con la etiqueta de la
+    versión del juego. Las armas que no cambiaron reutilizan los objetos de
+    versiones anteriores.
+
+    :param desde: timestamp desde el que rige la versión (por defecto, ahora).
+    """
+    objetos_dir = os.path.join(versiones_dir, "objetos")
+    os.makedirs(objetos_dir, exist_ok=True)
+    armas = {}
+    nuevos = 0
+    for filename in sorted(os.listdir(directorio)):
+        weapon_name, extension = os.path.splitext(filename)
+        if extension != ".json":
+            continue
+        datos = _puntos_serializados(weapon_name, directorio)
+        cambio = not os.path.exists(os.path.join(objetos_dir, f"{_hash(datos)}.trz"))
+        entrada = {
+            "puntos": _guardar_objeto(datos, "trz", objetos_dir),
+            "cadencia_ms": CADENCIA_MS.get(weapon_name, CADENCIA_POR_DEFECTO_MS),
+        }
+        path_png = os.path.join(directorio, f"{weapon_name}.png")
+        if os.path.exists(path_png):
+            with open(path_png, "rb") as f:
+                png = f.read()
+            cambio |= not os.path.exists(os.path.join(objetos_dir, f"{_hash(png)}.png"))
+            entrada["png"] = _guardar_objeto(png, "png", objetos_dir)
+        nuevos += cambio
+        armas[weapon_name] = entrada
+
+    manifiesto = {"version": version, "desde": time.time() if desde is None else desde, "armas": armas}
+    path = os.path.join(versiones_dir, f"{version}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifiesto, f, indent=4)
+    os.replace(path + ".tmp", path)
+    return manifiesto, nuevos
+
+
+class VersionesPatrones:
+    """
+    Acceso a todas las versiones registradas. Los patrones se cargan bajo
+    demanda y se cachean por hash de contenido, así las armas idénticas entre
+    versiones comparten un único PatronArma; la caché es LRU y acotada.
+    """
+    def __init__(self, versiones_dir=VERSIONES_DIR, max_en_memoria=MAX_PATRONES_EN_MEMORIA):
+        self.versiones_dir = versiones_dir
+        self.objetos_dir = os.path.join(versiones_dir, "objetos")
+        self.max_en_memoria = max_en_memoria
+        self._cache = collections.OrderedDict()
+        self.manifiestos = {}
+        if os.path.exists(versiones_dir):
+            for filename in os.listdir(versiones_dir):
+                if filename.endswith(".json"):
+                    with open(os.path.join(versiones_dir, filename), "r") as f:
+                        manifiesto = json.load(f)
+                    self.manifiestos[manifiesto["version"]] = manifiesto
+        # Orden cronológico para buscar la versión vigente
+        self.orden = sorted(self.manifiestos, key=lambda v: self.manifiestos[v]["desde"])
+        self._desde = np.array([self.manifiestos[v]["desde"] for v in self.orden], dtype=np.float64)
+
+    def version_vigente(self, timestamp):
+        """Versión que regía en el instante dado (None si es anterior a todas)."""
+        i = int(np.searchsorted(self._desde, timestamp, side="right")) - 1
+        return self.orden[i] if i >= 0 else None
+
+    def patron(self, version, weapon):
+        """PatronArma del arma en esa versión (o None)."""
+        entrada = self.manifiestos[version]["armas"].get(weapon)
+        if entrada is None:
+            return None
+        clave = (entrada["puntos"], entrada["cadencia_ms"])
+        patron = self._cache.get(clave)
+        if patron is not None:
+            self._cache.move_to_end(clave)
+            return patron
+        registros = leer_registros(os.path.join(self.objetos_dir, f"{entrada['puntos']}.trz"))
+        puntos = puntos_de_registro(registros[-1]).astype(np.float32)
+        puntos[:, 1] *= -1  # Y hacia abajo, como patrones.cargar_puntos
+        patron = PatronArma(weapon, puntos, entrada["cadencia_ms"])
+        self._cache[clave] = patron
+        if len(self._cache) > self.max_en_memoria:
+            self._cache.popitem(last=False)
+        return patron
+
+    def ruta_png(self, version, weapon):
+        entrada = self.manifiestos[version]["armas"].get(weapon)
+        if entrada is None or "png" not in entrada:
+            return None
+        return os.path.join(self.objetos_dir, f"{entrada['png']}.png")
+
+    def diff(self, version_a, version_b):
+        """
+        Desplazamiento por bala de cada arma entre dos versiones. Los puntos de
+        todas las armas se apilan en un array (armas, balas, 2) relleno con NaN
+        y las distancias se calculan de una vez.
+
+        Devuelve (armas, desplazamientos (armas, balas), balas_a, balas_b, solo_a, solo_b).
+        """
+        armas_a = self.manifiestos[version_a]["armas"]
+        armas_b = self.manifiestos[version_b]["armas"]
+        comunes = sorted(set(armas_a) & set(armas_b))
+        solo_a = sorted(set(armas_a) - set(armas_b))
+        solo_b = sorted(set(armas_b) - set(armas_a))
+
+        pa = [self.patron(version_a, w).puntos for w in comunes]
+        pb = [self.patron(version_b, w).puntos for w in comunes]
+        balas_a = np.array([len(p) for p in pa], dtype=np.int32)
+        balas_b = np.array([len(p) for p in pb], dtype=np.int32)
+        n = int(max(balas_a.max(initial=0), balas_b.max(initial=0)))
+        A = np.full((len(comunes), n, 2), np.nan, dtype=np.float32)
+        B = np.full((len(comunes), n, 2), np.nan, dtype=np.float32)
+        for i, (a, b) in enumerate(zip(pa, pb)):
+            A[i, :len(a)] = a
+            B[i, :len(b)] = b
+        desplazamientos = np.hypot(B[..., 0] - A[..., 0], B[..., 1] - A[..., 1])
+        return comunes, desplazamientos, balas_a, balas_b, solo_a, solo_b
+
+    def puntuar_historial(self, sprays):
+        """
+        Error por bala de cada spray contra el patrón vigente en su fecha.
+        Genera (spray, version, errores).
+        """
+        for spray in sprays:
+            version = self.version_vigente(spray.timestamp)
+            patron = self.patron(version, spray.weapon) if version else None
+            if patron is None:
+                yield spray, version, None
+            else:
+                yield spray, version, errores_por_bala(spray.posiciones(), spray.tiempos_ms, patron)
+
+
+def imprimir_diff(versiones, version_a, version_b, umbral_px=0.5):
+    comunes, desplazamientos, balas_a, balas_b, solo_a, solo_b = versiones.diff(version_a, version_b)
+    print(f"Diff {version_a} -> {version_b}")
+    validos = ~np.isnan(desplazamientos)
+    d = np.where(validos, desplazamientos, 0)
+    maximos = d.max(axis=1, initial=0)
+    medios = d.sum(axis=1) / np.maximum(validos.sum(axis=1), 1)
+    sin_cambios = (balas_a == balas_b) & (maximos <= umbral_px)
+    for i, weapon in enumerate(comunes):
+        if sin_cambios[i]:
+            continue
+        fila = desplazamientos[i, :min(balas_a[i], balas_b[i])]
+        cambiadas = np.flatnonzero(fila > umbral_px) + 1
+        print(f"  {weapon}: balas {balas_a[i]} -> {balas_b[i]}, desplazamiento medio {medios[i]:.1f} px, "
+              f"máx {maximos[i]:.1f} px, balas cambiadas {cambiadas.tolist()}")
+    for weapon in solo_a:
+        print(f"  {weapon}: eliminada")
+    for weapon in solo_b:
+        print(f"  {weapon}: nueva")
+    print(f"  ({int(sin_cambios.sum())} armas sin cambios)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versiones de patrones de recoil por parche del juego")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    reg = sub.add_parser("registrar", help="guardar el set actual de recoil_json/ como una versión")
+    reg.add_argument("version")
+    reg.add_argument("--desde", help="fecha desde la que rige (AAAA-MM-DD)")
+    sub.add_parser("listar")
+    dif = sub.add_parser("diff")
+    dif.add_argument("version_a")
+    dif.add_argument("version_b")
+    dif.add_argument("--umbral", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.comando == "registrar":
+        desde = time.mktime(time.strptime(args.desde, "%Y-%m-%d")) if args.desde else None
+        manifiesto, nuevos = registrar_version(args.version, desde)
+        print(f"[OK] Versión '{args.version}' registrada: {len(manifiesto['armas'])} armas, {nuevos} con cambios")
+    elif args.comando == "listar":
+        versiones = VersionesPatrones()
+        for version in versiones.orden:
+            m = versiones.manifiestos[version]
+            fecha = time.strftime("%Y-%m-%d", time.localtime(m["desde"]))
+            print(f"  {version:20s} desde {fecha}  ({len(m['armas'])} armas)")
+    else:
+        imprimir_diff(VersionesPatrones(), args.version_a, args.version_b, args.umbral)
+
+
+if __name__ == "__main__":
+    main()